@@ -8,18 +8,30 @@ import csv
 import json
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import torch
 from datetime import datetime
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
+import functools
 import os
 
+# Rows of float16 embeddings upcast to float32 at a time during search
+SEARCH_BLOCK_ROWS = 65536
+
+# Distinct recent queries whose embeddings are kept per instance
+QUERY_CACHE_SIZE = 1024
+
 class FastMedicalEmbeddings:
     def __init__(self):
         """Initialize with optimized sentence-transformers model"""
         self.model = None
         self.embeddings = None
         self.metadata = None
+        self.text_offsets = None
+        # Per-instance cache of query embeddings, cleared when a model is loaded
+        self.embed_query = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self.encode_query)
         
         print("🤗 Fast Hugging Face Medical Embeddings")
         print("⚡ Optimized for speed and quality")
@@ -31,6 +43,15 @@ class FastMedicalEmbeddings:
         try:
             self.model = SentenceTransformer(model_name)
             self.model_name = model_name
+            self.embed_query.cache_clear()
+            
+            # Use the available cores for CPU encoding and skip autograd state
+            torch.set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+            try:
+                torch.set_num_interop_threads(2)
+            except RuntimeError:
+                pass  # Can only be set once per process
+            self.model.eval()
             print(f"✅ Model loaded successfully!")
             return True
         except Exception as e:
@@ -42,7 +63,12 @@ class FastMedicalEmbeddings:
         print(f"📖 Loading dataset from {csv_path}...")
         
         try:
-            df = pd.read_csv(csv_path)
+            # Multi-threaded Arrow CSV parser instead of pandas' single-threaded one
+            table = pacsv.read_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(use_threads=True, block_size=8 << 20)
+            )
+            df = table.to_pandas()
             print(f"✅ Loaded {len(df)} records")
             
             # Prepare texts and metadata
@@ -61,7 +87,6 @@ class FastMedicalEmbeddings:
                     'confidence_score': float(row.get('confidence_score', 0.5)),
                     'source_dataset': row.get('source_dataset', ''),
                     'keywords': row.get('keywords', ''),
-                    'text_preview': row.get('text', '')[:200],
                     'full_text': row.get('text', '')
                 })
             
@@ -93,13 +118,19 @@ class FastMedicalEmbeddings:
         print(f"⚡ Creating embeddings for {len(texts)} texts...")
         print("🚀 Using optimized batch processing...")
         
-        self.embeddings = self.model.encode(
-            texts,
-            batch_size=64,  # Larger batch size for speed
-            show_progress_bar=True,
-            convert_to_tensor=False,
-            normalize_embeddings=True  # Better for cosine similarity
-        )
+        # One encode call over all the texts: SentenceTransformer sorts them by
+        # length before batching and returns the embeddings in input order
+        with torch.inference_mode():
+            self.embeddings = self.model.encode(
+                texts,
+                batch_size=64,  # Larger batch size for speed
+                show_progress_bar=True,
+                convert_to_tensor=False,
+                normalize_embeddings=True  # Better for cosine similarity
+            )
+        
+        # Stored as float16 to halve size
+        self.embeddings = self.embeddings.astype(np.float16)
         
         print(f"✅ Generated {len(self.embeddings)} embeddings!")
         
@@ -141,29 +172,63 @@ class FastMedicalEmbeddings:
         # Save embeddings
         np.save('fast_medical_embeddings.npy', self.embeddings)
         
-        # Save metadata
-        with open('fast_medical_metadata.json', 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+        # Save full texts separately so search can read single rows
+        self.save_full_texts()
+        
+        # Save metadata as columnar parquet
+        metadata_df = pd.DataFrame(self.metadata).drop(columns=['full_text'])
+        table = pa.Table.from_pandas(metadata_df, preserve_index=False)
+        pq.write_table(table, 'fast_medical_metadata.parquet', compression='zstd')
         
-        # Save complete package
-        with open('fast_medical_complete.pkl', 'wb') as f:
-            pickle.dump({
-                'embeddings': self.embeddings,
-                'metadata': self.metadata,
-                'model_name': self.model_name
-            }, f)
+        # Save model info
+        with open('fast_medical_model_info.json', 'w') as f:
+            json.dump({'model_name': self.model_name}, f, indent=2)
         
         print(f"✅ Saved to:")
         print(f"  - fast_medical_embeddings.npy")
-        print(f"  - fast_medical_metadata.json")
-        print(f"  - fast_medical_complete.pkl")
+        print(f"  - fast_medical_metadata.parquet")
+        print(f"  - fast_medical_full_texts.bin")
+        print(f"  - fast_medical_full_text_offsets.npy")
+        print(f"  - fast_medical_model_info.json")
+    
+    def save_full_texts(self):
+        """Write full texts as one utf-8 blob plus int64 row offsets"""
+        offsets = np.zeros(len(self.metadata) + 1, dtype=np.int64)
+        
+        with open('fast_medical_full_texts.bin', 'wb') as f:
+            for i, item in enumerate(self.metadata):
+                text = item.get('full_text')
+                data = text.encode('utf-8') if isinstance(text, str) else b''
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        
+        np.save('fast_medical_full_text_offsets.npy', offsets)
+    
+    def read_full_texts(self, indices):
+        """Read the full texts of the given rows only"""
+        texts = []
+        
+        with open('fast_medical_full_texts.bin', 'rb') as f:
+            for idx in indices:
+                start, end = int(self.text_offsets[idx]), int(self.text_offsets[idx + 1])
+                f.seek(start)
+                texts.append(f.read(end - start).decode('utf-8'))
+        
+        return texts
     
     def load_embeddings(self):
         """Load saved embeddings"""
         try:
-            self.embeddings = np.load('fast_medical_embeddings.npy')
-            with open('fast_medical_metadata.json', 'r') as f:
-                self.metadata = json.load(f)
+            # Memory-map so pages are read on demand and shared across processes
+            self.embeddings = np.load('fast_medical_embeddings.npy', mmap_mode='r')
+            
+            # Metadata holds only lookup fields; full text is read per hit
+            self.metadata = pq.read_table('fast_medical_metadata.parquet').to_pylist()
+            self.text_offsets = np.load('fast_medical_full_text_offsets.npy', mmap_mode='r')
+            
+            if os.path.exists('fast_medical_model_info.json'):
+                with open('fast_medical_model_info.json', 'r') as f:
+                    self.model_name = json.load(f)['model_name']
             print(f"✅ Loaded {len(self.embeddings)} embeddings")
             return True
         except Exception as e:
@@ -184,24 +249,58 @@ class FastMedicalEmbeddings:
         print(f"🔍 Searching: '{query}'")
         
         # Generate query embedding
-        query_embedding = self.model.encode([query], normalize_embeddings=True)
-        
-        # Calculate similarities (fast with normalized embeddings)
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+        query_embedding = self.embed_query(query)
         
         # Get top results
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        top_indices, similarities = self.rank(query_embedding, top_k)
+        
+        # Read full texts for the hits only
+        if self.text_offsets is not None:
+            texts = [{'full_text': text} for text in self.read_full_texts(top_indices)]
+        else:
+            texts = [{} for _ in top_indices]
         
         results = []
         for i, idx in enumerate(top_indices):
             results.append({
                 'rank': i + 1,
                 'similarity': float(similarities[idx]),
-                'metadata': self.metadata[idx]
+                'metadata': {**self.metadata[idx], **texts[i]}
             })
         
         return results
     
+    def encode_query(self, query):
+        """Embed a query; called through the per-instance embed_query cache"""
+        with torch.inference_mode():
+            query_embedding = self.model.encode([query], normalize_embeddings=True)[0]
+        query_embedding.setflags(write=False)
+        return query_embedding
+    
+    def rank(self, query_embedding, top_k):
+        """Return the top_k row indices and all similarities for a query embedding"""
+        # Calculate similarities (dot product == cosine for normalized embeddings)
+        similarities = self.similarities(query_embedding)
+        # Partition out the top_k candidates, then sort only those
+        kth = min(max(top_k, 0), len(similarities))
+        if kth == 0:
+            return np.empty(0, dtype=np.intp), similarities
+        candidates = np.argpartition(similarities, -kth)[-kth:]
+        top_indices = candidates[np.argsort(-similarities[candidates])]
+        return top_indices, similarities
+    
+    def similarities(self, query_vector):
+        """Dot product of the query against the float16 embeddings, block by block"""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        similarities = np.empty(len(self.embeddings), dtype=np.float32)
+        
+        # Upcast one block at a time so BLAS runs in float32 while reads stay float16
+        for start in range(0, len(self.embeddings), SEARCH_BLOCK_ROWS):
+            block = self.embeddings[start:start + SEARCH_BLOCK_ROWS]
+            similarities[start:start + len(block)] = block.astype(np.float32) @ query_vector
+        
+        return similarities
+    
     def print_results(self, results):
         """Pretty print search results"""
         print(f"\n📋 SEARCH RESULTS:")
@@ -211,7 +310,7 @@ class FastMedicalEmbeddings:
             print(f"\n🏥 #{result['rank']} | Score: {result['similarity']:.3f}")
             print(f"📝 Specialty: {result['metadata']['medical_specialty']}")
             print(f"🔑 Keywords: {result['metadata']['keywords']}")
-            print(f"📄 Text: {result['metadata']['text_preview']}...")
+            print(f"📄 Text: {result['metadata']['full_text'][:200]}...")
             print("-" * 80)
 
 def main():
@@ -56,7 +56,7 @@ def search_medical_records(query, num_results=5):
                 "Similarity Score": f"{result['similarity']:.3f}",
                 "Medical Specialty": metadata['medical_specialty'],
                 "Keywords": metadata['keywords'],
-                "Text Preview": metadata['text_preview'],
+                "Text Preview": metadata['full_text'][:200],
                 "Confidence Score": metadata['confidence_score'],
                 "Source Dataset": metadata['source_dataset']
             }
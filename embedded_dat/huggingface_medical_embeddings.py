@@ -14,8 +14,12 @@ import torch
 from transformers import AutoTokenizer, AutoModel
 from sklearn.metrics.pairwise import cosine_similarity
 import pickle
+import functools
 import os
 
+# Distinct recent queries whose embeddings are kept per instance
+QUERY_CACHE_SIZE = 1024
+
 class GodzillaMedicalEmbeddings:
     def __init__(self, model_name="microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract"):
         """
@@ -27,6 +31,8 @@ class GodzillaMedicalEmbeddings:
         self.embeddings = None
         self.metadata = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        # Per-instance cache of query embeddings, cleared when a model is loaded
+        self.embed_query = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self.encode_query)
         
         print(f"🤗 Initializing Hugging Face Medical Embeddings")
         print(f"🏥 Model: {model_name}")
@@ -35,12 +41,17 @@ class GodzillaMedicalEmbeddings:
     def load_model(self):
         """Load BioBERT model and tokenizer"""
         print(f"📥 Loading BioBERT model...")
+        self.embed_query.cache_clear()
         
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
             self.model = AutoModel.from_pretrained(self.model_name)
             self.model.to(self.device)
             self.model.eval()
+            
+            # Warm up tokenizer and model so the first query is not slower
+            with torch.inference_mode():
+                self.model(**self.tokenizer([""], return_tensors='pt').to(self.device))
             print(f"✅ Model loaded successfully!")
             return True
         except Exception as e:
@@ -93,6 +104,25 @@ class GodzillaMedicalEmbeddings:
             print(f"  Using sentence-transformers for embedding generation...")
             return self.model.encode(texts, show_progress_bar=True, convert_to_tensor=False)
     
+    def encode_query(self, query):
+        """Embed a query; called through the per-instance embed_query cache"""
+        if hasattr(self.model, 'encode'):
+            # sentence-transformers fallback
+            query_embedding = self.model.encode([query], show_progress_bar=False, convert_to_tensor=False)[0]
+        else:
+            # Call the fast tokenizer and model directly for a single string
+            inputs = self.tokenizer(
+                query,
+                truncation=True,
+                max_length=512,
+                return_tensors='pt'
+            ).to(self.device)
+            with torch.inference_mode():
+                outputs = self.model(**inputs)
+            query_embedding = outputs.last_hidden_state[0, 0, :].cpu().numpy()
+        query_embedding.setflags(write=False)
+        return query_embedding
+    
     def load_dataset(self, csv_path="godzilla_medical_dataset.csv"):
         """Load Godzilla medical dataset"""
         print(f"📖 Loading dataset from {csv_path}...")
@@ -117,7 +147,6 @@ class GodzillaMedicalEmbeddings:
                     'confidence_score': float(row.get('confidence_score', 0.5)),
                     'source_dataset': row.get('source_dataset', ''),
                     'keywords': row.get('keywords', ''),
-                    'text_preview': row.get('text', '')[:200],
                     'full_text': row.get('text', '')
                 })
             
@@ -205,7 +234,7 @@ class GodzillaMedicalEmbeddings:
     def load_embeddings(self):
         """Load previously saved embeddings"""
         try:
-            self.embeddings = np.load('godzilla_medical_embeddings.npy')
+            self.embeddings = np.load('godzilla_medical_embeddings.npy', mmap_mode='r')
             with open('godzilla_medical_metadata.json', 'r') as f:
                 self.metadata = json.load(f)
             print(f"✅ Loaded {len(self.embeddings)} embeddings")
@@ -228,13 +257,16 @@ class GodzillaMedicalEmbeddings:
         print(f"🔍 Searching for: '{query}'")
         
         # Generate query embedding
-        query_embedding = self.get_embeddings([query])
+        query_embedding = self.embed_query(query)[np.newaxis, :]
         
         # Calculate similarities
         similarities = cosine_similarity(query_embedding, self.embeddings)[0]
         
         # Get top results
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Partition out the top_k candidates, then sort only those
+        kth = min(top_k, len(similarities))
+        candidates = np.argpartition(similarities, -kth)[-kth:]
+        top_indices = candidates[np.argsort(-similarities[candidates])]
         
         results = []
         for i, idx in enumerate(top_indices):
@@ -256,7 +288,7 @@ class GodzillaMedicalEmbeddings:
             print(f"\n🏥 Rank {result['rank']} | Similarity: {result['similarity']:.3f}")
             print(f"📝 Specialty: {result['metadata']['medical_specialty']}")
             print(f"🔑 Keywords: {result['metadata']['keywords']}")
-            print(f"📄 Text: {result['metadata']['text_preview']}...")
+            print(f"📄 Text: {result['metadata']['full_text'][:200]}...")
             print("-" * 80)
 
 def main():
@@ -92,7 +92,7 @@ def demo_searches():
             for result in results:
                 print(f"🏥 Similarity: {result['similarity']:.3f}")
                 print(f"📝 Specialty: {result['metadata']['medical_specialty']}")
-                print(f"📄 Text: {result['metadata']['text_preview'][:150]}...")
+                print(f"📄 Text: {result['metadata']['full_text'][:150]}...")
                 print()
         else:
             print("❌ No results found.")
@@ -4,8 +4,80 @@ Monitor the Pinecone upload progress
 """
 
 import os
-import time
-import subprocess
+import json
+import threading
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+LOG_FILE = 'upload_log.txt'
+REPORT_FILE = 'pinecone_upload_report.json'
+
+def load_report():
+    """Return the upload report, or None while it is missing or still being written"""
+    try:
+        with open(REPORT_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class UploadEventHandler(FileSystemEventHandler):
+    """React to changes of the upload log and report files"""
+    
+    def __init__(self, done):
+        self.done = done
+        self.report = None
+        self.log_fh = None
+        self.last_pos = 0
+        if os.path.exists(LOG_FILE):
+            self.open_log(at_end=True)
+    
+    def open_log(self, at_end=False):
+        """Keep the log open so each change reads only the new bytes"""
+        self.close()
+        self.log_fh = open(LOG_FILE, 'r')
+        if at_end:
+            self.log_fh.seek(0, os.SEEK_END)
+        self.last_pos = self.log_fh.tell()
+    
+    def close(self):
+        if self.log_fh is not None:
+            self.log_fh.close()
+            self.log_fh = None
+    
+    def on_created(self, event):
+        if os.path.basename(event.src_path) == LOG_FILE:
+            # A recreated log is a new file; follow it from the start
+            self.open_log()
+        self.on_modified(event)
+    
+    def on_closed(self, event):
+        self.on_modified(event)
+    
+    def on_modified(self, event):
+        name = os.path.basename(event.src_path)
+        
+        if name == LOG_FILE:
+            if self.log_fh is None:
+                self.open_log()
+            
+            # Start over if the log was truncated below what we already read
+            if os.fstat(self.log_fh.fileno()).st_size < self.last_pos:
+                self.last_pos = 0
+            
+            # Show last line of the newly appended text
+            self.log_fh.seek(self.last_pos)
+            new = self.log_fh.read()
+            self.last_pos = self.log_fh.tell()
+            if new.strip():
+                last_line = new.rstrip().rsplit('\n', 1)[-1].strip()
+                print(f"📊 Status: {last_line}")
+        
+        elif name == REPORT_FILE and not self.done.is_set():
+            # The report is written in place, so only finish once it parses
+            self.report = load_report()
+            if self.report is not None:
+                print("🎉 Upload report found! Upload completed successfully!")
+                self.done.set()
 
 def monitor_upload():
     """Monitor the upload progress"""
@@ -13,54 +85,42 @@ def monitor_upload():
     print("🦖 MONITORING GODZILLA DATASET UPLOAD TO PINECONE")
     print("=" * 60)
     
-    while True:
-        try:
-            # Check if process is still running
-            result = subprocess.run(['pgrep', '-f', 'upload_to_pinecone'], 
-                                  capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print("✅ Upload process completed!")
-                break
-            
-            # Show last few lines of log
-            if os.path.exists('upload_log.txt'):
-                with open('upload_log.txt', 'r') as f:
-                    lines = f.readlines()
-                    if lines:
-                        last_line = lines[-1].strip()
-                        print(f"📊 Status: {last_line}")
-            
-            # Check for completion files
-            if os.path.exists('pinecone_upload_report.json'):
-                print("🎉 Upload report found! Upload completed successfully!")
-                break
-            
-            time.sleep(10)  # Check every 10 seconds
-            
-        except KeyboardInterrupt:
-            print("\n⏹️ Monitoring stopped by user")
-            break
-        except Exception as e:
-            print(f"❌ Error monitoring: {e}")
-            break
+    done = threading.Event()
+    
+    # Let the kernel notify us of file changes instead of polling
+    handler = UploadEventHandler(done)
+    handler.report = load_report()
+    if handler.report is not None:
+        print("🎉 Upload report found! Upload completed successfully!")
+        done.set()
+    
+    observer = Observer()
+    observer.schedule(handler, '.', recursive=False)
+    observer.start()
+    
+    try:
+        done.wait()
+    except KeyboardInterrupt:
+        print("\n⏹️ Monitoring stopped by user")
+    finally:
+        observer.stop()
+        observer.join()
+        handler.close()
     
     # Show final results if available
-    if os.path.exists('pinecone_upload_report.json'):
+    report = handler.report or load_report()
+    if report is not None:
         print("\n📋 FINAL UPLOAD REPORT:")
         print("=" * 30)
-        with open('pinecone_upload_report.json', 'r') as f:
-            import json
-            report = json.load(f)
-            print(f"📊 Total Records: {report.get('total_records', 'N/A'):,}")
-            print(f"🚀 Vectors Uploaded: {report.get('vectors_uploaded', 'N/A'):,}")
-            print(f"📈 Success Rate: {report.get('success_rate', 'N/A'):.1f}%")
-            print(f"🏥 Index Name: {report.get('index_name', 'N/A')}")
-            print(f"🤖 Model: {report.get('embedding_model', 'N/A')}")
+        print(f"📊 Total Records: {report.get('total_records', 'N/A'):,}")
+        print(f"🚀 Vectors Uploaded: {report.get('vectors_uploaded', 'N/A'):,}")
+        print(f"📈 Success Rate: {report.get('success_rate', 'N/A'):.1f}%")
+        print(f"🏥 Index Name: {report.get('index_name', 'N/A')}")
+        print(f"🤖 Model: {report.get('embedding_model', 'N/A')}")
     
-    if os.path.exists('upload_log.txt'):
+    if os.path.exists(LOG_FILE):
         print("\n📝 Final log entries:")
-        with open('upload_log.txt', 'r') as f:
+        with open(LOG_FILE, 'r') as f:
             lines = f.readlines()
             for line in lines[-5:]:
                 print(f"   {line.strip()}")
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import csv
 import re
-from pypdf import PdfReader
+import pypdfium2 as pdfium
 
 PDF = '/project/workspace/d64483912-cmd/studious-lamp-dataset/source_pdfs/nelson-source-1.pdf'
 OUT = '/project/workspace/d64483912-cmd/studious-lamp-dataset/extracted_txt/normalized/page_heading_map.csv'
@@ -11,17 +11,21 @@ CHAPTER_LINE_TRAILNUM = re.compile(r"^\s*Chapter\s+(\d+)\s*[^A-Za-z0-9]?\s*(.+?)
 PART_ANY = re.compile(r"\bPart\s+([IVX]+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
 CHAPTER_ANY = re.compile(r"\bChapter\s+(\d+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
 TRAILING_PAGE = re.compile(r"(\d{1,4})\s*$")
+TRAIL_NUM_STRIP = re.compile(r"\s+\d{1,4}\s*$")
 
-reader = PdfReader(PDF)
+pdf = pdfium.PdfDocument(PDF)
 current_part = (None, None)
 current_chapter = (None, None)
 last_book_page = None
 
 with open(OUT, 'w', newline='', encoding='utf-8') as f:
-    w = csv.DictWriter(f, fieldnames=['book_page','pdf_page','part_roman','part_title','chapter_number','chapter_title'])
-    w.writeheader()
-    for i, page in enumerate(reader.pages, start=1):
-        text = (page.extract_text() or '')
+    w = csv.writer(f)
+    w.writerow(['book_page','pdf_page','part_roman','part_title','chapter_number','chapter_title'])
+    for i in range(1, len(pdf) + 1):
+        page = pdf[i - 1]
+        textpage = page.get_textpage()
+        text = (textpage.get_text_range() or '')
+        textpage.close(); page.close()
         lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
 
         book_page = None
@@ -42,7 +46,7 @@ with open(OUT, 'w', newline='', encoding='utf-8') as f:
                 m = CHAPTER_LINE_TRAILNUM.match(ln)
                 if m:
                     chapter_num = m.group(1)
-                    chapter_title = re.sub(r"\s+\d{1,4}\s*$", "", m.group(2)).strip()
+                    chapter_title = TRAIL_NUM_STRIP.sub("", m.group(2)).strip()
                     book_page = int(m.group(3))
                     current_chapter = (chapter_num, chapter_title)
                     break
@@ -60,7 +64,7 @@ with open(OUT, 'w', newline='', encoding='utf-8') as f:
                 m = CHAPTER_ANY.search(ln)
                 if m:
                     chapter_num = m.group(1)
-                    chapter_title = re.sub(r"\s+\d{1,4}\s*$", "", m.group(2)).strip()
+                    chapter_title = TRAIL_NUM_STRIP.sub("", m.group(2)).strip()
                     current_chapter = (chapter_num, chapter_title)
                     break
 
@@ -78,13 +82,6 @@ with open(OUT, 'w', newline='', encoding='utf-8') as f:
                 book_page = 0
         last_book_page = book_page
 
-        w.writerow({
-            'book_page': book_page,
-            'pdf_page': i,
-            'part_roman': part,
-            'part_title': part_title,
-            'chapter_number': chapter_num,
-            'chapter_title': chapter_title,
-        })
+        w.writerow((book_page, i, part, part_title, chapter_num, chapter_title))
 
 print(OUT)
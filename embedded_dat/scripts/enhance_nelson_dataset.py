@@ -6,16 +6,76 @@ Adds additional features and improvements to the existing Nelson pediatric datas
 
 import csv
 import re
-import json
 import argparse
-from typing import Dict, List, Set
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
 from collections import defaultdict, Counter
+from itertools import chain, islice
 import uuid
+import ahocorasick
+import orjson
+
+WHITESPACE = re.compile(r'\s')
+# Concept patterns for learning objectives, in priority order. IGNORECASE stays
+# because they run on the original-case text.
+CONCEPT_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'\b([A-Z][a-z]+ (?:syndrome|disease|disorder|condition))\b',
+    r'\b((?:acute|chronic) \w+)\b',
+    r'\b(\w+(?:itis|osis|pathy|emia|uria))\b',
+))
+# Word alternatives per age group; every group is matched as a whole word
+AGE_PATTERNS = {
+    'neonate': r'neonat|newborn|birth',
+    'infant': r'infant|baby|babies',
+    'toddler': r'toddler|1-3 years?|2-3 years?',
+    'preschool': r'preschool|3-5 years?|4-5 years?',
+    'school_age': r'school.?age|6-12 years?|elementary',
+    'adolescent': r'adolescent|teen|teenager|13-18 years?',
+    'all_ages': r'all ages|pediatric|children|child'
+}
+# All age groups in one alternation so the text is scanned once; lastgroup names the
+# match. The shared word boundaries sit outside the groups, which keeps the scan fast.
+AGE_GROUP_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(f'(?P<{group}>{pattern})' for group, pattern in AGE_PATTERNS.items()) + r')\b'
+)
+# Key verbs that indicate learning goals, rotated across a chunk's objectives
+LEARNING_VERBS = {
+    'understand': 'Understand the',
+    'identify': 'Identify key',
+    'describe': 'Describe the',
+    'explain': 'Explain how',
+    'recognize': 'Recognize signs of',
+    'differentiate': 'Differentiate between',
+    'manage': 'Manage patients with',
+    'evaluate': 'Evaluate children with'
+}
+LEARNING_VERB_PHRASES = tuple(LEARNING_VERBS.values())
+# Recent (chunk_text, chapter_title) analyses kept for repeated boilerplate chunks
+ANALYSIS_CACHE_SIZE = 4096
+ENHANCED_AT = '2024-09-12T12:00:00'
+ENHANCED_FIELDS = [
+    'medical_concepts', 'reading_difficulty', 'clinical_relevance_score',
+    'age_groups', 'learning_objectives', 'enhanced_at'
+]
+
+
+@dataclass(slots=True)
+class AnalysisResult:
+    """All per-chunk enhancement features from one analysis pass."""
+    medical_concepts: Dict[str, List[str]]
+    reading_difficulty: str
+    clinical_relevance: float
+    age_groups: List[str]
+    learning_objectives: List[str]
+
 
 class NelsonDatasetEnhancer:
     def __init__(self):
         self.medical_concepts = self._load_medical_concepts()
+        self.clinical_indicators = self._load_clinical_indicators()
         self.difficulty_levels = {'basic': 1, 'intermediate': 2, 'advanced': 3, 'expert': 4}
+        self.automaton = self._build_automaton()
         
     def _load_medical_concepts(self) -> Dict[str, Set[str]]:
         """Define medical concept categories for tagging."""
@@ -46,24 +106,86 @@ class NelsonDatasetEnhancer:
             }
         }
     
-    def calculate_reading_difficulty(self, text: str) -> str:
-        """Estimate reading difficulty level based on text complexity."""
-        if not text:
-            return 'basic'
-        
-        words = text.split()
+    def _load_clinical_indicators(self) -> Dict[str, float]:
+        """Define clinical indicator terms and their relevance weights."""
+        return {
+            'treatment': 0.15,
+            'diagnosis': 0.15,
+            'patient': 0.1,
+            'clinical': 0.1,
+            'therapy': 0.1,
+            'management': 0.1,
+            'intervention': 0.1,
+            'outcome': 0.08,
+            'prognosis': 0.08,
+            'guidelines': 0.08,
+            'evidence': 0.05,
+            'recommendation': 0.05
+        }
+
+    def _build_automaton(self) -> ahocorasick.Automaton:
+        """Build one Aho-Corasick automaton over all concepts and clinical indicators.
+
+        Each term maps to (term, categories, weight) so a single pass over the
+        lowercased text finds every concept and indicator at once.
+        """
+        categories = defaultdict(list)
+        for category, concepts in self.medical_concepts.items():
+            for concept in concepts:
+                categories[concept].append(category)
+
+        automaton = ahocorasick.Automaton()
+        for term in set(categories) | set(self.clinical_indicators):
+            automaton.add_word(term, (term, tuple(categories.get(term, ())), self.clinical_indicators.get(term, 0.0)))
+        automaton.make_automaton()
+        return automaton
+
+    def _scan_terms(self, text_lower: str) -> Tuple[List[str], Set[str], List[Tuple[int, int]]]:
+        """Run the automaton once over lowercased text.
+
+        Returns concept terms in first-seen order, the clinical indicators found,
+        and the (start, end) offsets of single-word concept hits in text order
+        (for the jargon count).
+        """
+        concepts = []
+        seen = set()
+        indicators = set()
+        jargon_spans = []
+        for end, (term, categories, weight) in self.automaton.iter(text_lower):
+            if categories:
+                if term not in seen:
+                    seen.add(term)
+                    concepts.append(term)
+                if ' ' not in term:
+                    jargon_spans.append((end - len(term) + 1, end))
+            if weight:
+                indicators.add(term)
+        return concepts, indicators, jargon_spans
+
+    def _group_concepts(self, concepts: List[str]) -> Dict[str, List[str]]:
+        """Group concept terms by category, keeping categories in definition order."""
+        found_concepts = defaultdict(list)
+        for term in concepts:
+            for category in self.automaton.get(term)[1]:
+                found_concepts[category].append(term)
+        return {category: found_concepts[category] for category in self.medical_concepts if category in found_concepts}
+
+    def _classify_difficulty(self, text: str, text_lower: str, words: List[str], jargon_spans: List[Tuple[int, int]]) -> str:
+        """Classify difficulty from word lengths and the words containing a concept."""
         word_count = len(words)
-        
         if word_count == 0:
             return 'basic'
         
-        # Count complex indicators
+        # Count complex indicators; a word is jargon if any concept occurs inside it
         long_words = sum(1 for word in words if len(word) > 7)
-        medical_jargon = sum(1 for word in words if any(
-            concept in word.lower() for concepts in self.medical_concepts.values()
-            for concept in concepts
-        ))
-        complex_sentences = len(re.findall(r'[.!?]+', text))
+        # hits arrive in end order and never span whitespace, so a hit starts a new
+        # word exactly when whitespace separates it from the previous hit
+        medical_jargon = 0
+        prev_end = -1
+        for start, end in jargon_spans:
+            if prev_end < 0 or (start > prev_end and WHITESPACE.search(text_lower, prev_end + 1, start)):
+                medical_jargon += 1
+            prev_end = end
         
         # Calculate complexity score
         complexity_score = (
@@ -81,53 +203,63 @@ class NelsonDatasetEnhancer:
             return 'advanced'
         else:
             return 'expert'
+
+    def _score_relevance(self, text_lower: str, indicators: Set[str]) -> float:
+        """Sum indicator weights in definition order, plus the practical-content boost."""
+        score = 0.0
+        
+        for indicator, weight in self.clinical_indicators.items():
+            if indicator in indicators:
+                score += weight
+        
+        # Boost score for practical content
+        if any(phrase in text_lower for phrase in [
+            'should be', 'must be', 'recommended', 'indicated', 'contraindicated',
+            'first-line', 'second-line', 'standard care'
+        ]):
+            score += 0.1
+        
+        return min(score, 1.0)
+
+    def _match_age_groups(self, text_lower: str) -> List[str]:
+        """Match pediatric age groups against lowercased text."""
+        seen = {m.lastgroup for m in AGE_GROUP_PATTERN.finditer(text_lower)}
+        found_groups = [group for group in AGE_PATTERNS if group in seen]
+        
+        return found_groups if found_groups else ['all_ages']
+
+    def calculate_reading_difficulty(self, text: str) -> str:
+        """Estimate reading difficulty level based on text complexity."""
+        if not text:
+            return 'basic'
+        
+        text_lower = text.lower()
+        _, _, jargon_spans = self._scan_terms(text_lower)
+        return self._classify_difficulty(text, text_lower, text.split(), jargon_spans)
     
     def extract_medical_concepts(self, text: str) -> Dict[str, List[str]]:
         """Extract medical concepts by category from text."""
-        text_lower = text.lower()
-        found_concepts = defaultdict(list)
-        
-        for category, concepts in self.medical_concepts.items():
-            for concept in concepts:
-                if concept in text_lower:
-                    found_concepts[category].append(concept)
-        
-        return dict(found_concepts)
+        concepts, _, _ = self._scan_terms(text.lower())
+        return self._group_concepts(concepts)
     
     def generate_learning_objectives(self, text: str, chapter_title: str = '') -> List[str]:
         """Generate learning objectives based on content."""
         objectives = []
         
-        # Extract key verbs that indicate learning goals
-        learning_verbs = {
-            'understand': 'Understand the',
-            'identify': 'Identify key',
-            'describe': 'Describe the',
-            'explain': 'Explain how',
-            'recognize': 'Recognize signs of',
-            'differentiate': 'Differentiate between',
-            'manage': 'Manage patients with',
-            'evaluate': 'Evaluate children with'
-        }
-        
-        # Find important concepts in text
-        important_concepts = []
-        concept_patterns = [
-            r'\b([A-Z][a-z]+ (?:syndrome|disease|disorder|condition))\b',
-            r'\b((?:acute|chronic) \w+)\b',
-            r'\b(\w+(?:itis|osis|pathy|emia|uria))\b',
-        ]
-        
-        for pattern in concept_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            important_concepts.extend([match for match in matches if len(match) > 3])
+        # Find important concepts in text; only the first three are used, so the
+        # patterns are scanned lazily in priority order and stop once three are found
+        important_concepts = list(islice((
+            match for pattern in CONCEPT_PATTERNS
+            for match in (m.group(1) for m in pattern.finditer(text))
+            if len(match) > 3
+        ), 3))
         
         # Generate objectives based on found concepts
         concepts_used = set()
         for concept in important_concepts[:3]:  # Limit to top 3
             if concept.lower() not in concepts_used:
-                verb = list(learning_verbs.keys())[len(objectives) % len(learning_verbs)]
-                objective = f"{learning_verbs[verb]} {concept.lower()}"
+                phrase = LEARNING_VERB_PHRASES[len(objectives) % len(LEARNING_VERB_PHRASES)]
+                objective = f"{phrase} {concept.lower()}"
                 objectives.append(objective)
                 concepts_used.add(concept.lower())
         
@@ -139,116 +271,108 @@ class NelsonDatasetEnhancer:
     
     def calculate_clinical_relevance(self, text: str) -> float:
         """Calculate clinical relevance score (0-1)."""
-        clinical_indicators = {
-            'treatment': 0.15,
-            'diagnosis': 0.15,
-            'patient': 0.1,
-            'clinical': 0.1,
-            'therapy': 0.1,
-            'management': 0.1,
-            'intervention': 0.1,
-            'outcome': 0.08,
-            'prognosis': 0.08,
-            'guidelines': 0.08,
-            'evidence': 0.05,
-            'recommendation': 0.05
-        }
-        
         text_lower = text.lower()
-        score = 0.0
-        
-        for indicator, weight in clinical_indicators.items():
-            if indicator in text_lower:
-                score += weight
-        
-        # Boost score for practical content
-        if any(phrase in text_lower for phrase in [
-            'should be', 'must be', 'recommended', 'indicated', 'contraindicated',
-            'first-line', 'second-line', 'standard care'
-        ]):
-            score += 0.1
-        
-        return min(score, 1.0)
+        _, indicators, _ = self._scan_terms(text_lower)
+        return self._score_relevance(text_lower, indicators)
     
     def extract_age_groups(self, text: str) -> List[str]:
         """Extract relevant pediatric age groups from text."""
-        age_patterns = {
-            'neonate': r'\b(?:neonat|newborn|birth)\b',
-            'infant': r'\b(?:infant|baby|babies)\b',
-            'toddler': r'\b(?:toddler|1-3 years?|2-3 years?)\b',
-            'preschool': r'\b(?:preschool|3-5 years?|4-5 years?)\b',
-            'school_age': r'\b(?:school.?age|6-12 years?|elementary)\b',
-            'adolescent': r'\b(?:adolescent|teen|teenager|13-18 years?)\b',
-            'all_ages': r'\b(?:all ages|pediatric|children|child)\b'
-        }
-        
-        found_groups = []
+        return self._match_age_groups(text.lower())
+    
+    def analyze_text(self, text: str, chapter_title: str = '') -> AnalysisResult:
+        """Compute all enhancement features with one lowercase, one split and one automaton sweep."""
         text_lower = text.lower()
+        concepts, indicators, jargon_spans = self._scan_terms(text_lower)
         
-        for group, pattern in age_patterns.items():
-            if re.search(pattern, text_lower):
-                found_groups.append(group)
-        
-        return found_groups if found_groups else ['all_ages']
+        return AnalysisResult(
+            medical_concepts=self._group_concepts(concepts),
+            reading_difficulty=self._classify_difficulty(text, text_lower, text.split(), jargon_spans) if text else 'basic',
+            clinical_relevance=self._score_relevance(text_lower, indicators),
+            age_groups=self._match_age_groups(text_lower),
+            learning_objectives=self.generate_learning_objectives(text, chapter_title),
+        )
     
     def enhance_dataset(self, input_file: str, output_file: str) -> None:
         """Main enhancement function."""
         print(f"Enhancing Nelson dataset: {input_file}")
         
-        enhanced_records = []
         stats = defaultdict(int)
         
+        # rows are written as they are enhanced, so only the stats stay in memory;
+        # columns are addressed by position to avoid a dict per row
         with open(input_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+            reader = csv.reader(f)
+            header = next(reader, [])
+            rows = (row for row in reader if row)
+            first_row = next(rows, None)
             
-            for row in reader:
-                stats['total_records'] += 1
+            if first_row is not None:
+                fieldnames = header + [k for k in ENHANCED_FIELDS if k not in header]
+                col = {name: idx for idx, name in enumerate(fieldnames)}
+                width = len(header)
+                pad = [''] * (len(fieldnames) - width)
+                text_idx = col.get('chunk_text')
+                chapter_idx = col.get('chapter_title')
+                enhanced_idx = [col[k] for k in ENHANCED_FIELDS]
+                # usual case: the input has none of the fields, so they are simply appended
+                appends_fields = enhanced_idx == list(range(width, width + len(ENHANCED_FIELDS)))
+                analyze = lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self.analyze_text)
                 
-                # Get existing data
-                text = row.get('chunk_text', '')
-                chapter_title = row.get('chapter_title', '')
-                
-                # Calculate new features
-                medical_concepts = self.extract_medical_concepts(text)
-                reading_difficulty = self.calculate_reading_difficulty(text)
-                clinical_relevance = self.calculate_clinical_relevance(text)
-                age_groups = self.extract_age_groups(text)
-                learning_objectives = self.generate_learning_objectives(text, chapter_title)
-                
-                # Create enhanced record
-                enhanced_record = dict(row)  # Copy existing data
-                enhanced_record.update({
-                    'medical_concepts': json.dumps(medical_concepts),
-                    'reading_difficulty': reading_difficulty,
-                    'clinical_relevance_score': round(clinical_relevance, 3),
-                    'age_groups': ','.join(age_groups),
-                    'learning_objectives': '|'.join(learning_objectives),
-                    'enhanced_at': '2024-09-12T12:00:00'
-                })
-                
-                enhanced_records.append(enhanced_record)
-                
-                # Update stats
-                stats[f'difficulty_{reading_difficulty}'] += 1
-                stats['with_medical_concepts'] += 1 if medical_concepts else 0
-                stats['high_clinical_relevance'] += 1 if clinical_relevance > 0.5 else 0
-        
-        # Write enhanced dataset
-        if enhanced_records:
-            fieldnames = list(enhanced_records[0].keys())
-            
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(enhanced_records)
+                with open(output_file, 'w', newline='', encoding='utf-8') as out_f:
+                    writer = csv.writer(out_f)
+                    writer.writerow(fieldnames)
+                    
+                    for row in chain((first_row,), rows):
+                        stats['total_records'] += 1
+                        
+                        # Get existing data, fitting short or long rows to the header
+                        if len(row) != width:
+                            row = (row + [''] * width)[:width]
+                        text = row[text_idx] if text_idx is not None else ''
+                        chapter_title = row[chapter_idx] if chapter_idx is not None else ''
+                        
+                        # Calculate new features; blank chunks get the defaults
+                        # without any analysis, repeated chunks come from the cache
+                        if not text.strip():
+                            stats['empty_chunk_text'] += 1
+                            result = AnalysisResult({}, 'basic', 0.0, ['all_ages'], self.generate_learning_objectives('', chapter_title))
+                        else:
+                            result = analyze(text, chapter_title)
+                        medical_concepts = result.medical_concepts
+                        reading_difficulty = result.reading_difficulty
+                        clinical_relevance = result.clinical_relevance
+                        age_groups = result.age_groups
+                        learning_objectives = result.learning_objectives
+                        
+                        # Extend the row with the new features and write it out
+                        values = (
+                            orjson.dumps(medical_concepts).decode(),
+                            reading_difficulty,
+                            round(clinical_relevance, 3),
+                            ','.join(age_groups),
+                            '|'.join(learning_objectives) if learning_objectives else '',
+                            ENHANCED_AT
+                        )
+                        if appends_fields:
+                            row.extend(values)
+                        else:
+                            row.extend(pad)
+                            for idx, value in zip(enhanced_idx, values):
+                                row[idx] = value
+                        writer.writerow(row)
+                        
+                        # Update stats
+                        stats[f'difficulty_{reading_difficulty}'] += 1
+                        stats['with_medical_concepts'] += 1 if medical_concepts else 0
+                        stats['high_clinical_relevance'] += 1 if clinical_relevance > 0.5 else 0
         
         # Write enhancement statistics
         stats_file = output_file.replace('.csv', '_enhancement_stats.json')
-        with open(stats_file, 'w') as f:
-            json.dump(dict(stats), f, indent=2)
+        with open(stats_file, 'wb') as f:
+            f.write(orjson.dumps(dict(stats), option=orjson.OPT_INDENT_2))
         
         print(f"\nEnhancement complete!")
-        print(f"Enhanced {len(enhanced_records)} records")
+        print(f"Enhanced {stats['total_records']} records")
         print(f"Output: {output_file}")
         print(f"Statistics: {stats_file}")
         self.print_enhancement_stats(stats)
@@ -1,129 +1,166 @@
 #!/usr/bin/env python3
 import csv
+import os
 import re
+from collections import namedtuple
+from multiprocessing import Pool
 from typing import Dict, Tuple, Optional
-from pypdf import PdfReader
+import pypdfium2 as pdfium
 
-PART_LINE_WITH_NUM = re.compile(r"^\s*(\d{1,4})\s+Part\s+([IVXLCDM]+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
+# Header lines, tried in priority order in one match per line: "<page> Part <roman> <title>",
+# "Chapter <n> <title> <page>", or just a leading page number
+HEADER_LINE = re.compile(
+    r"^\s*(?:"
+    r"(?P<part_page>\d{1,4})\s+Part\s+(?P<part>[IVXLCDM]+)\s*[^A-Za-z0-9]?\s*(?P<part_title>.+)$"
+    r"|Chapter\s+(?P<chapter>\d+)\s*[^A-Za-z0-9]?\s*(?P<chapter_title>.+?)\s+(?P<chapter_page>\d{1,4})\s*$"
+    r"|(?P<page>\d{1,4})\b"
+    r")",
+    re.IGNORECASE,
+)
 PART_ANYWHERE = re.compile(r"Part\s+([IVXLCDM]+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
-CHAPTER_LINE_TRAILNUM = re.compile(r"^\s*Chapter\s+(\d+)\s*[^A-Za-z0-9]?\s*(.+?)\s+(\d{1,4})\s*$", re.IGNORECASE)
 CHAPTER_ANY = re.compile(r"Chapter\s+(\d+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
-LEADING_NUM = re.compile(r"^\s*(\d{1,4})\b")
+TRAIL_NUM_STRIP = re.compile(r"\s+\d{1,4}\s*$")
+POOL_CHUNKSIZE = 32
 
+# One heading-map row per book page; a tuple instead of a dict per page
+PageEntry = namedtuple('PageEntry', 'pdf_page part_roman part_title chapter_number chapter_title')
 
-def build_map(pdf_path: str, out_csv: str) -> None:
-    reader = PdfReader(pdf_path)
-    current_part: Tuple[Optional[str], Optional[str]] = (None, None)
-    current_chapter: Tuple[Optional[str], Optional[str]] = (None, None)
+# PDF handle opened in each pool worker by init_worker
+WORKER_PDF = None
+
+
+def page_text(pdf, index: int) -> str:
+    """Extract the text of one page with PDFium, closing the page handles afterwards"""
+    page = pdf[index]
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range() or ''
+    finally:
+        textpage.close()
+        page.close()
+
+
+def init_worker(pdf_path: str) -> None:
+    """Open the PDF once per pool worker"""
+    global WORKER_PDF
+    WORKER_PDF = pdfium.PdfDocument(pdf_path)
 
-    page_map: Dict[int, Dict[str, Optional[str]]] = {}
 
-    for i, page in enumerate(reader.pages, start=1):
-        t = (page.extract_text() or '')
-        lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
-        book_page = None
-        part = None
-        part_title = None
-        chapter_num = None
-        chapter_title = None
+def parse_page(i: int) -> Tuple[int, Optional[int], Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """Parse the headings of 1-based page i; None marks anything not found on the page itself"""
+    t = page_text(WORKER_PDF, i - 1)
+    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
+    book_page = None
+    part = None
+    part_title = None
+    chapter_num = None
+    chapter_title = None
 
+    # one pass over the lines: a part header wins outright, otherwise keep the
+    # first chapter line with trailing number and the first leading number
+    part_line = chapter_line = page_line = None
+    for ln in lines:
+        m = HEADER_LINE.match(ln)
+        if not m:
+            continue
+        if m.group('part_page') is not None:
+            part_line = m
+            break
+        if m.group('chapter_page') is not None:
+            if chapter_line is None:
+                chapter_line = m
+        elif page_line is None:
+            page_line = m
+
+    if part_line is not None:
+        book_page = int(part_line.group('part_page'))
+        part = part_line.group('part')
+        part_title = part_line.group('part_title')
+    elif chapter_line is not None:
+        # chapter line with trailing number (header form)
+        chapter_num = chapter_line.group('chapter')
+        chapter_title = chapter_line.group('chapter_title')
+        book_page = int(chapter_line.group('chapter_page'))
+    elif page_line is not None:
+        # fallback: leading number at line start
+        book_page = int(page_line.group('page'))
+    # capture part/chapter context anywhere in page
+    if part is None or part_title is None:
         for ln in lines:
-            m = PART_LINE_WITH_NUM.match(ln)
+            m = PART_ANYWHERE.search(ln)
             if m:
-                book_page = int(m.group(1))
-                part = m.group(2)
-                part_title = m.group(3)
-                current_part = (part, part_title)
+                part = m.group(1)
+                part_title = m.group(2)
                 break
-        if book_page is None:
-            # detect chapter line with trailing number (header form)
-            for ln in lines:
-                m = CHAPTER_LINE_TRAILNUM.match(ln)
-                if m:
-                    chapter_num = m.group(1)
-                    chapter_title = m.group(2)
-                    book_page = int(m.group(3))
-                    current_chapter = (chapter_num, chapter_title)
-                    break
-        # fallback: leading number at line start
-        if book_page is None:
-            for ln in lines:
-                m = LEADING_NUM.match(ln)
-                if m:
-                    book_page = int(m.group(1))
-                    break
-        # capture part/chapter context anywhere in page
-        if part is None or part_title is None:
-            for ln in lines:
-                m = PART_ANYWHERE.search(ln)
-                if m:
-                    part = m.group(1)
-                    part_title = m.group(2)
-                    current_part = (part, part_title)
-                    break
-        if chapter_num is None or chapter_title is None:
-            for ln in lines:
-                m = CHAPTER_ANY.search(ln)
-                if m:
-                    chapter_num = m.group(1)
-                    # avoid overly long titles by stripping trailing numbers
-                    ch_title = re.sub(r"\s+\d{1,4}\s*$", "", m.group(2)).strip()
-                    chapter_title = ch_title
-                    current_chapter = (chapter_num, chapter_title)
-                    break
+    if chapter_num is None or chapter_title is None:
+        for ln in lines:
+            m = CHAPTER_ANY.search(ln)
+            if m:
+                chapter_num = m.group(1)
+                # avoid overly long titles by stripping trailing numbers
+                chapter_title = TRAIL_NUM_STRIP.sub("", m.group(2)).strip()
+                break
+
+    return i, book_page, part, part_title, chapter_num, chapter_title
+
+
+def build_map(pdf_path: str, out_csv: str) -> None:
+    pdf = pdfium.PdfDocument(pdf_path)
+    page_count = len(pdf)
+    pdf.close()
 
+    # pages are parsed independently in parallel; the part/chapter carry-over
+    # needs the previous pages, so it is done in the serial sweep below
+    with Pool(os.cpu_count(), initializer=init_worker, initargs=(pdf_path,)) as pool:
+        results = pool.map(parse_page, range(1, page_count + 1), chunksize=POOL_CHUNKSIZE)
+
+    current_part: Tuple[Optional[str], Optional[str]] = (None, None)
+    current_chapter: Tuple[Optional[str], Optional[str]] = (None, None)
+
+    page_map: Dict[int, PageEntry] = {}
+    max_page = None
+
+    for i, book_page, part, part_title, chapter_num, chapter_title in results:
         # use context from previous pages
-        if part is None and part_title is None:
+        if part is None:
             part, part_title = current_part
-        if chapter_num is None and chapter_title is None:
+        else:
+            current_part = (part, part_title)
+        if chapter_num is None:
             chapter_num, chapter_title = current_chapter
+        else:
+            current_chapter = (chapter_num, chapter_title)
 
         if book_page is None:
             # approximate by incrementing from previous if available
-            if page_map:
-                prev = max(page_map.keys())
-                book_page = prev + 1
+            if max_page is not None:
+                book_page = max_page + 1
             else:
                 # unknown at very beginning
                 book_page = 0
+        if max_page is None or book_page > max_page:
+            max_page = book_page
 
-        page_map[book_page] = {
-            'pdf_page': i,
-            'part_roman': part,
-            'part_title': part_title,
-            'chapter_number': chapter_num,
-            'chapter_title': chapter_title,
-        }
+        page_map[book_page] = PageEntry(i, part, part_title, chapter_num, chapter_title)
 
     # fill gaps if any
     if page_map:
-        minp, maxp = min(page_map.keys()), max(page_map.keys())
+        minp = min(page_map)
         last = None
-        for p in range(minp, maxp+1):
-            if p in page_map:
-                last = page_map[p]
+        for p in range(minp, max_page+1):
+            entry = page_map.get(p)
+            if entry is not None:
+                last = entry
             else:
                 if last is None:
                     continue
-                page_map[p] = dict(last)
-                page_map[p]['pdf_page'] = None
+                page_map[p] = last._replace(pdf_page=None)
 
     # write csv ordered by page
-    rows = []
-    for p in sorted(page_map.keys()):
-        rows.append({
-            'book_page': p,
-            'pdf_page': page_map[p]['pdf_page'],
-            'part_roman': page_map[p]['part_roman'],
-            'part_title': page_map[p]['part_title'],
-            'chapter_number': page_map[p]['chapter_number'],
-            'chapter_title': page_map[p]['chapter_title'],
-        })
-
     with open(out_csv, 'w', newline='', encoding='utf-8') as f:
-        w = csv.DictWriter(f, fieldnames=['book_page','pdf_page','part_roman','part_title','chapter_number','chapter_title'])
-        w.writeheader()
-        w.writerows(rows)
+        w = csv.writer(f)
+        w.writerow(['book_page','pdf_page','part_roman','part_title','chapter_number','chapter_title'])
+        w.writerows((p, *page_map[p]) for p in sorted(page_map))
 
 
 if __name__ == '__main__':
@@ -1,70 +1,120 @@
 #!/usr/bin/env python3
 import csv
+import json
+import os
 import re
 import sys
-from pypdf import PdfReader
+from multiprocessing import Pool
+import pypdfium2 as pdfium
 
-PART_LINE_WITH_NUM = re.compile(r"^\s*(\d{1,4})\s+Part\s+([IVX]+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
-CHAPTER_LINE_TRAILNUM = re.compile(r"^\s*Chapter\s+(\d+)\s*[^A-Za-z0-9]?\s*(.+?)\s+(\d{1,4})\s*$", re.IGNORECASE)
+# Header lines, tried in priority order in one match per line: "<page> Part <roman> <title>",
+# "Chapter <n> <title> <page>", or just a leading page number
+HEADER_LINE = re.compile(
+    r"^\s*(?:"
+    r"(?P<part_page>\d{1,4})\s+Part\s+(?P<part>[IVX]+)\s*[^A-Za-z0-9]?\s*(?P<part_title>.+)$"
+    r"|Chapter\s+(?P<chapter>\d+)\s*[^A-Za-z0-9]?\s*(?P<chapter_title>.+?)\s+(?P<chapter_page>\d{1,4})\s*$"
+    r"|(?P<page>\d{1,4})\b"
+    r")",
+    re.IGNORECASE,
+)
 PART_ANY = re.compile(r"\bPart\s+([IVX]+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
 CHAPTER_ANY = re.compile(r"\bChapter\s+(\d+)\s*[^A-Za-z0-9]?\s*(.+)$", re.IGNORECASE)
-LEADING_NUM = re.compile(r"^\s*(\d{1,4})\b")
+TRAIL_NUM_STRIP = re.compile(r"\s+\d{1,4}\s*$")
+
+POOL_CHUNKSIZE = 32
 
 pdf_path = '/project/workspace/d64483912-cmd/studious-lamp-dataset/source_pdfs/nelson-source-1.pdf'
-start = int(sys.argv[1])
-end = int(sys.argv[2])
-out_path = sys.argv[3]
-append = sys.argv[4] == '1'
-
-reader = PdfReader(pdf_path)
-current_part=(None,None)
-current_chapter=(None,None)
-
-mode = 'a' if append else 'w'
-with open(out_path, mode, newline='', encoding='utf-8') as f:
-    fieldnames=['book_page','pdf_page','part_roman','part_title','chapter_number','chapter_title']
-    w=csv.DictWriter(f, fieldnames=fieldnames)
-    if not append:
-        w.writeheader()
-    for i in range(start, min(end, len(reader.pages))+1):
-        text = (reader.pages[i-1].extract_text() or '')
-        lines=[ln.strip() for ln in text.splitlines() if ln.strip()]
-        book_page=None
-        part=None; part_title=None
-        chapter_num=None; chapter_title=None
+
+# PDF handle opened in each pool worker by init_worker
+WORKER_PDF = None
+
+
+def init_worker(path):
+    """Open the PDF once per pool worker"""
+    global WORKER_PDF
+    WORKER_PDF = pdfium.PdfDocument(path)
+
+
+def parse_page(i):
+    """Parse the headings of 1-based page i; None marks anything not found on the page itself"""
+    page = WORKER_PDF[i-1]
+    textpage = page.get_textpage()
+    text = (textpage.get_text_range() or '')
+    textpage.close(); page.close()
+    lines=[ln.strip() for ln in text.splitlines() if ln.strip()]
+    book_page=None
+    part=None; part_title=None
+    chapter_num=None; chapter_title=None
+    part_line=chapter_line=page_line=None
+    for ln in lines:
+        m=HEADER_LINE.match(ln)
+        if not m:
+            continue
+        if m.group('part_page') is not None:
+            part_line=m; break
+        if m.group('chapter_page') is not None:
+            if chapter_line is None: chapter_line=m
+        elif page_line is None:
+            page_line=m
+    if part_line is not None:
+        book_page=int(part_line.group('part_page')); part=part_line.group('part'); part_title=part_line.group('part_title')
+    elif chapter_line is not None:
+        chapter_num=chapter_line.group('chapter'); chapter_title=TRAIL_NUM_STRIP.sub("", chapter_line.group('chapter_title')).strip(); book_page=int(chapter_line.group('chapter_page'))
+    elif page_line is not None:
+        book_page=int(page_line.group('page'))
+    if part is None or part_title is None:
+        for ln in lines:
+            m=PART_ANY.search(ln)
+            if m:
+                part=m.group(1); part_title=m.group(2); break
+    if chapter_num is None or chapter_title is None:
         for ln in lines:
-            m=PART_LINE_WITH_NUM.match(ln)
+            m=CHAPTER_ANY.search(ln)
             if m:
-                book_page=int(m.group(1)); part=m.group(2); part_title=m.group(3)
+                chapter_num=m.group(1); chapter_title=TRAIL_NUM_STRIP.sub("", m.group(2)).strip(); break
+    return i, book_page, part, part_title, chapter_num, chapter_title
+
+
+def extract_range(pool, page_count, start, end, out_path, append):
+    """Write the heading rows for pages start..end using an already running worker pool"""
+    # pages are parsed in parallel; the part/chapter carry-over is a serial sweep
+    results = pool.map(parse_page, range(start, min(end, page_count)+1), chunksize=POOL_CHUNKSIZE)
+
+    current_part=(None,None)
+    current_chapter=(None,None)
+
+    mode = 'a' if append else 'w'
+    with open(out_path, mode, newline='', encoding='utf-8') as f:
+        w=csv.writer(f)
+        if not append:
+            w.writerow(['book_page','pdf_page','part_roman','part_title','chapter_number','chapter_title'])
+        for i, book_page, part, part_title, chapter_num, chapter_title in results:
+            if part is None:
+                part,part_title=current_part
+            else:
                 current_part=(part,part_title)
-                break
-        if book_page is None:
-            for ln in lines:
-                m=CHAPTER_LINE_TRAILNUM.match(ln)
-                if m:
-                    chapter_num=m.group(1); chapter_title=re.sub(r"\s+\d{1,4}\s*$","", m.group(2)).strip(); book_page=int(m.group(3))
-                    current_chapter=(chapter_num, chapter_title)
-                    break
-        if book_page is None:
-            for ln in lines:
-                m=LEADING_NUM.match(ln)
-                if m:
-                    book_page=int(m.group(1)); break
-        if part is None or part_title is None:
-            for ln in lines:
-                m=PART_ANY.search(ln)
-                if m:
-                    part=m.group(1); part_title=m.group(2); current_part=(part,part_title); break
-        if chapter_num is None or chapter_title is None:
-            for ln in lines:
-                m=CHAPTER_ANY.search(ln)
-                if m:
-                    chapter_num=m.group(1); chapter_title=re.sub(r"\s+\d{1,4}\s*$","", m.group(2)).strip(); current_chapter=(chapter_num, chapter_title); break
-        if part is None and part_title is None:
-            part,part_title=current_part
-        if chapter_num is None and chapter_title is None:
-            chapter_num,chapter_title=current_chapter
-        if book_page is None:
-            book_page = 0
-        w.writerow({'book_page':book_page,'pdf_page':i,'part_roman':part,'part_title':part_title,'chapter_number':chapter_num,'chapter_title':chapter_title})
-print('wrote',start,end)
+            if chapter_num is None:
+                chapter_num,chapter_title=current_chapter
+            else:
+                current_chapter=(chapter_num, chapter_title)
+            if book_page is None:
+                book_page = 0
+            w.writerow((book_page, i, part, part_title, chapter_num, chapter_title))
+    print('wrote',start,end)
+
+
+if __name__ == '__main__':
+    # either one range as "start end out_path append", or "-" to read a JSON list of
+    # [start, end, out_path, append] ranges from stdin so the PDF is opened once for all
+    if sys.argv[1] == '-':
+        ranges = [(int(start), int(end), out_path, bool(append)) for start, end, out_path, append in json.load(sys.stdin)]
+    else:
+        ranges = [(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3], sys.argv[4] == '1')]
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    page_count = len(pdf)
+    pdf.close()
+
+    with Pool(os.cpu_count(), initializer=init_worker, initargs=(pdf_path,)) as pool:
+        for start, end, out_path, append in ranges:
+            extract_range(pool, page_count, start, end, out_path, append)
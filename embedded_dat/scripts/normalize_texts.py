@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import mmap
 import os
 import sys
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Dict, Any
 
+import numpy as np
+import orjson
+
+# C0 control codes other than tab/newline/carriage return/form feed; in UTF-8 these
+# are always single bytes, so counting them in the encoded buffer is exact
+CONTROL_BYTES = np.array([c for c in range(32) if c not in (9, 10, 12, 13)], dtype=np.intp)
+# str.translate table deleting C0 control characters except tab and newline
+CTRL_DELETE = dict.fromkeys(c for c in range(32) if c not in (9, 10))
+
 
 def analyze(text: str) -> Dict[str, Any]:
     metrics = {
@@ -35,28 +46,22 @@ def analyze(text: str) -> Dict[str, Any]:
     metrics["trailing_ws_lines"] = trailing
     metrics["empty_run_max"] = empty_run_max
     # count C0 control chars except tab/newline/carriage return/form feed
-    controls = 0
-    for ch in text:
-        o = ord(ch)
-        if o < 32 and ch not in ("\n", "\r", "\t", "\f"):
-            controls += 1
-    metrics["control_chars_count"] = controls
+    buf = np.frombuffer(text.encode("utf-8", errors="surrogatepass"), dtype=np.uint8)
+    metrics["control_chars_count"] = int(np.bincount(buf, minlength=256)[CONTROL_BYTES].sum())
     return metrics
 
 
-def clean_text(data: bytes) -> Dict[str, Any]:
-    has_bom = data.startswith(b"\xef\xbb\xbf")
-    if has_bom:
-        data = data[3:]
-    try:
-        raw_text = data.decode("utf-8", errors="replace")
-    except Exception:
-        raw_text = data.decode("utf-8", errors="replace")
+def clean_text(data) -> Dict[str, Any]:
+    """Clean UTF-8 bytes or any bytes-like buffer (e.g. an mmap) without copying it first."""
+    has_bom = data[:3] == b"\xef\xbb\xbf"
+    with memoryview(data) as view:
+        raw_text = str(view[3:] if has_bom else view, "utf-8", "replace")
 
     pre_metrics = analyze(raw_text)
     pre_metrics["has_bom"] = has_bom
 
     text = raw_text
+    del raw_text
     applied = {"removed_bom": has_bom, "normalized_unicode_nfc": True, "cr_to_lf": False, "ff_to_newline": False, "stripped_trailing_ws": False, "collapsed_blank_lines": False, "removed_controls": False, "ensured_newline_eof": False}
 
     # Normalize Unicode
@@ -74,18 +79,13 @@ def clean_text(data: bytes) -> Dict[str, Any]:
 
     # Remove other C0 control characters except tab and newline
     before_len = len(text)
-    text = "".join(ch for ch in text if not (ord(ch) < 32 and ch not in ("\n", "\t")))
+    text = text.translate(CTRL_DELETE)
     applied["removed_controls"] = (len(text) != before_len)
 
     # Strip trailing whitespace per line
-    lines = text.split("\n")
-    stripped_any = False
-    for i, line in enumerate(lines):
-        new_line = line.rstrip(" \t")
-        if new_line != line:
-            stripped_any = True
-        lines[i] = new_line
-    applied["stripped_trailing_ws"] = stripped_any
+    raw_lines = text.split("\n")
+    lines = [line.rstrip(" \t") for line in raw_lines]
+    applied["stripped_trailing_ws"] = (lines != raw_lines)
 
     # Collapse multiple blank lines to a single blank line, and trim leading/trailing blanks
     collapsed = []
@@ -99,11 +99,14 @@ def clean_text(data: bytes) -> Dict[str, Any]:
         else:
             collapsed.append(line)
             prev_blank = False
-    # Trim leading/trailing blank lines
-    while collapsed and collapsed[0] == "":
-        collapsed.pop(0)
-    while collapsed and collapsed[-1] == "":
-        collapsed.pop()
+    # Trim leading/trailing blank lines with one slice instead of repeated pop(0)
+    start = 0
+    while start < len(collapsed) and collapsed[start] == "":
+        start += 1
+    end = len(collapsed)
+    while end > start and collapsed[end - 1] == "":
+        end -= 1
+    collapsed = collapsed[start:end]
     applied["collapsed_blank_lines"] = (len(collapsed) != len(lines))
 
     cleaned = "\n".join(collapsed)
@@ -124,6 +127,27 @@ def clean_text(data: bytes) -> Dict[str, Any]:
     }
 
 
+def process_file(f: str, outdir: str) -> Dict[str, Any]:
+    """Clean one input file, write its normalized copy and return its report entry."""
+    # decode straight from the page cache instead of reading a heap copy first
+    with open(f, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                result = clean_text(mm)
+        else:
+            result = clean_text(b"")
+    out_path = os.path.join(outdir, os.path.basename(f).replace(".txt", "_normalized.txt"))
+    with open(out_path, "w", encoding="utf-8", newline="\n") as oh:
+        oh.write(result["cleaned_text"])
+    return {
+        "input": f,
+        "output": out_path,
+        "applied": result["applied"],
+        "pre_metrics": result["pre_metrics"],
+        "post_metrics": result["post_metrics"],
+    }
+
+
 def main():
     p = argparse.ArgumentParser(description="Normalize and clean text files safely")
     p.add_argument("files", nargs="+", help="Input text files")
@@ -132,27 +156,14 @@ def main():
 
     os.makedirs(args.outdir, exist_ok=True)
 
-    report = []
-    for f in args.files:
-        with open(f, "rb") as fh:
-            data = fh.read()
-        result = clean_text(data)
-        out_path = os.path.join(args.outdir, os.path.basename(f).replace(".txt", "_normalized.txt"))
-        with open(out_path, "w", encoding="utf-8", newline="\n") as oh:
-            oh.write(result["cleaned_text"])
-        entry = {
-            "input": f,
-            "output": out_path,
-            "applied": result["applied"],
-            "pre_metrics": result["pre_metrics"],
-            "post_metrics": result["post_metrics"],
-        }
-        report.append(entry)
+    # files are independent, so clean them on all cores; map keeps the report in input order
+    with ProcessPoolExecutor() as ex:
+        report = list(ex.map(process_file, args.files, repeat(args.outdir)))
 
     # write report next to outputs
     report_path = os.path.join(args.outdir, "clean_report.json")
-    with open(report_path, "w", encoding="utf-8") as rh:
-        json.dump(report, rh, indent=2, ensure_ascii=False)
+    with open(report_path, "wb") as rh:
+        rh.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
 
     print(report_path)
 
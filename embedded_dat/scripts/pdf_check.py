@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import os
 from typing import Any, Dict
+import orjson
 from pypdf import PdfReader
 
 
@@ -58,8 +58,8 @@ def main():
 
     report = check_pdf(args.pdf)
     os.makedirs(os.path.dirname(args.out_json), exist_ok=True)
-    with open(args.out_json, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    with open(args.out_json, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
 
     os.makedirs(os.path.dirname(args.sample_out), exist_ok=True)
     with open(args.sample_out, "w", encoding="utf-8") as f:
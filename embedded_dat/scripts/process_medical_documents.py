@@ -5,21 +5,52 @@ Cleans and enhances the raw medical documents dataset with comprehensive preproc
 """
 
 import csv
+import os
 import re
 import uuid
 from datetime import datetime
-from typing import Dict, List, Tuple, Set, Optional
-from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple, Set, Optional
+from collections import Counter, namedtuple
+from itertools import islice
+from multiprocessing import Pool
 import argparse
+import heapq
 import json
+import ahocorasick
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import re2
+import xxhash
+
+
+class NonWordDeleteTable(dict):
+    """str.translate table deleting everything regex \\W matches, filled in per code point on first use."""
+    
+    def __missing__(self, code_point: int) -> Optional[str]:
+        char = chr(code_point)
+        value = char if char.isalnum() or char == '_' else None
+        self[code_point] = value
+        return value
+
 
 # Patterns for cleaning and detection
-COPYRIGHT_PATTERN = re.compile(
-    r'Downloaded for .+? at .+? from .+? by .+? on .+?\. For personal use only\. No other uses without permission\. Copyright .+?',
-    re.IGNORECASE | re.DOTALL
+# The copyright notice's chain of lazy .+? groups backtracks polynomially on text that
+# starts a notice without finishing it, so it runs on RE2's linear-time engine
+# ((?is) = IGNORECASE | DOTALL)
+COPYRIGHT_PATTERN = re2.compile(
+    r'(?is)Downloaded for .+? at .+? from .+? by .+? on .+?\. For personal use only\. No other uses without permission\. Copyright .+?'
 )
 
-PAGE_ARTIFACT_PATTERNS = [
+WHITESPACE_PATTERN = re.compile(r'\s+')
+VERSION_NUMBER_PATTERN = re.compile(r'\b\d+\s*\.\s*\d+\s*\.\s*\d+\s*\b')  # Version numbers like "1.2.3"
+CODE_PATTERN = re.compile(r'\b[A-Z]{2,}\s*\d+\b')  # Codes like "ICD10"
+# Deletes every non-word character, giving the same result as re.sub(r'\W+', '', text)
+NON_WORD_DELETE = NonWordDeleteTable()
+KEYWORD_TOKEN_PATTERN = re.compile(r'\b[a-z][a-z0-9]{2,}\b')  # Lowercase words of 3+ characters
+
+PAGE_ARTIFACT_PATTERNS = (
     re.compile(r'^\s*Page\s+\d+\s*$', re.IGNORECASE),
     re.compile(r'^\s*Chapter\s+\d+\s*$', re.IGNORECASE),
     re.compile(r'^\s*Fig\.\s*\d+(\.\d+)*\s', re.IGNORECASE),
@@ -27,18 +58,25 @@ PAGE_ARTIFACT_PATTERNS = [
     re.compile(r'^\s*\d+\s*$'),  # Pure page numbers
     re.compile(r'^\s*[a-z]\s*$'),  # Single lowercase letters
     re.compile(r'^\s*[^\w\s]*\s*$'),  # Only punctuation
-]
+)
+
+# All artifact patterns in one alternation, keeping each one's case flag; every
+# alternative is anchored with ^, so match() and search() agree on it
+PAGE_ARTIFACT_PATTERN = re.compile('|'.join(
+    f'(?i:{p.pattern})' if p.flags & re.IGNORECASE else f'(?:{p.pattern})'
+    for p in PAGE_ARTIFACT_PATTERNS
+))
 
-REFERENCE_PATTERN = re.compile(r'\b\d{4};\d+:', re.IGNORECASE)
+REFERENCE_PATTERN = re.compile(r'\b\d{4};\d+:')  # Citations like "2019;12:"; no letters, so no case flag
 
 # Medical stopwords to exclude from keyword extraction
-MEDICAL_STOPWORDS = set([
+MEDICAL_STOPWORDS = frozenset([
     'patient', 'patients', 'disease', 'treatment', 'clinical', 'medical', 'condition',
     'diagnosis', 'therapy', 'symptoms', 'syndrome', 'disorders', 'health', 'care',
     'study', 'studies', 'cases', 'case', 'report', 'reports', 'review', 'analysis'
 ])
 
-GENERAL_STOPWORDS = set([
+GENERAL_STOPWORDS = frozenset([
     'the', 'of', 'and', 'in', 'to', 'for', 'with', 'by', 'from', 'at', 'on', 'as',
     'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'will', 'would',
     'could', 'should', 'may', 'might', 'can', 'must', 'shall', 'this', 'that', 'these',
@@ -50,6 +88,71 @@ GENERAL_STOPWORDS = set([
 
 ALL_STOPWORDS = MEDICAL_STOPWORDS | GENERAL_STOPWORDS
 
+# Specialty keyword vocabularies; dict order breaks ties between equal scores
+SPECIALTIES = {
+    'cardiology': frozenset(['heart', 'cardiac', 'cardiovascular', 'coronary', 'artery', 'valve']),
+    'neurology': frozenset(['brain', 'neurolog', 'seizure', 'stroke', 'cerebral', 'neural']),
+    'pediatrics': frozenset(['child', 'pediatric', 'infant', 'neonatal', 'growth', 'development']),
+    'urology': frozenset(['kidney', 'renal', 'urine', 'bladder', 'urinary', 'nephro']),
+    'endocrinology': frozenset(['hormone', 'diabetes', 'thyroid', 'endocrine', 'insulin']),
+    'dermatology': frozenset(['skin', 'rash', 'derma', 'lesion', 'cutaneous']),
+    'gastroenterology': frozenset(['stomach', 'intestine', 'liver', 'digestive', 'gastro']),
+    'pulmonology': frozenset(['lung', 'respiratory', 'asthma', 'pneumonia', 'breathing']),
+    'rheumatology': frozenset(['arthritis', 'joint', 'rheumatic', 'autoimmune', 'inflammation']),
+    'oncology': frozenset(['cancer', 'tumor', 'malignant', 'oncology', 'chemotherapy']),
+    'immunology': frozenset(['immune', 'allergy', 'antibody', 'immunologic', 'hypersensitivity']),
+    'psychiatry': frozenset(['depression', 'anxiety', 'psychiatric', 'mental', 'behavioral']),
+    'orthopedics': frozenset(['bone', 'fracture', 'orthopedic', 'musculoskeletal', 'joint']),
+    'emergency': frozenset(['emergency', 'trauma', 'acute', 'critical', 'resuscitation']),
+    'genetics': frozenset(['genetic', 'chromosome', 'hereditary', 'mutation', 'genomic'])
+}
+
+SPECIALTY_NAMES = tuple(SPECIALTIES)
+
+# One automaton over every specialty keyword, so a single pass over the text
+# finds all keywords it contains (as substrings, like the original `in` checks).
+# Each keyword maps to the indexes in SPECIALTY_NAMES of the specialties it scores for.
+SPECIALTY_AUTOMATON = ahocorasick.Automaton()
+for keyword in set().union(*SPECIALTIES.values()):
+    SPECIALTY_AUTOMATON.add_word(keyword, (keyword, tuple(
+        index for index, keywords in enumerate(SPECIALTIES.values()) if keyword in keywords
+    )))
+SPECIALTY_AUTOMATON.make_automaton()
+
+# Terms that earn the medical-content confidence bonus
+MEDICAL_TERMS = frozenset(['patient', 'treatment', 'diagnosis', 'symptoms', 'therapy', 'clinical'])
+
+# Rows handed to a pool worker at a time, raw rows cleaned per pool.map call, and
+# merged records enriched per pool.map call (these bound how much is read ahead)
+POOL_CHUNKSIZE = 512
+READ_BATCH_SIZE = 8192
+ENRICH_BATCH_SIZE = 2048
+# Recent lead-text enrichments kept per worker for repeated boilerplate fragments
+ENRICH_CACHE_SIZE = 4096
+
+# Input columns read from the raw CSV, and bytes parsed per Arrow CSV block
+# (large text rows must fit in one)
+INPUT_COLUMNS = ('text', 'page_number', 'source_file')
+CSV_BLOCK_SIZE = 64 << 20
+
+# Output columns; written as CSV, or as Parquet when the output path ends in .parquet
+OUTPUT_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('text', pa.string()),
+    ('page_number', pa.string()),
+    ('source_file', pa.string()),
+    ('medical_specialty', pa.string()),
+    ('keywords', pa.string()),
+    ('chunk_token_count', pa.int64()),
+    ('confidence_score', pa.float64()),
+    ('created_at', pa.string())
+])
+PARQUET_BATCH_SIZE = 2048
+
+# One cleaned input row; a tuple instead of a dict per row. page is page_number
+# parsed once by the worker, or None if it is not an integer
+RawRecord = namedtuple('RawRecord', 'text page_number source_file is_artifact page')
+
 
 class MedicalDocumentProcessor:
     def __init__(self):
@@ -62,6 +165,9 @@ class MedicalDocumentProcessor:
             'empty_removed': 0,
             'duplicates_removed': 0
         }
+        self.unique_count = 0
+        # One processing timestamp shared by every record created in this run
+        self.created_at = datetime.now().isoformat()
         
     def clean_text(self, text: str) -> str:
         """Clean individual text content."""
@@ -75,22 +181,22 @@ class MedicalDocumentProcessor:
             self.stats['removed_copyright'] += 1
         
         # Clean up whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = WHITESPACE_PATTERN.sub(' ', text.strip())
         
         # Remove common artifacts
-        text = re.sub(r'\b\d+\s*\.\s*\d+\s*\.\s*\d+\s*\b', '', text)  # Version numbers like "1.2.3"
-        text = re.sub(r'\b[A-Z]{2,}\s*\d+\b', '', text)  # Codes like "ICD10"
+        text = VERSION_NUMBER_PATTERN.sub('', text)
+        text = CODE_PATTERN.sub('', text)
         
         return text.strip()
     
     def is_artifact_record(self, text: str) -> bool:
         """Check if record is primarily page artifacts."""
-        if not text or len(text.strip()) < 5:
+        stripped = text.strip() if text else ''
+        if len(stripped) < 5:
             return True
             
-        for pattern in PAGE_ARTIFACT_PATTERNS:
-            if pattern.match(text.strip()):
-                return True
+        if PAGE_ARTIFACT_PATTERN.match(stripped):
+            return True
                 
         # Check for pure reference entries
         if REFERENCE_PATTERN.search(text) and len(text) < 100:
@@ -102,125 +208,131 @@ class MedicalDocumentProcessor:
             
         return False
     
-    def extract_keywords(self, text: str, k: int = 8) -> List[str]:
+    def extract_keywords(self, text: str, k: int = 8, text_lower: Optional[str] = None) -> List[str]:
         """Extract meaningful keywords from text."""
         if not text:
             return []
             
         # Tokenize and clean
-        words = re.findall(r'\b[a-zA-Z][a-zA-Z0-9]*\b', text.lower())
+        if text_lower is None:
+            text_lower = text.lower()
+        words = KEYWORD_TOKEN_PATTERN.findall(text_lower)
         
         # Count frequency, excluding stopwords
-        freq = defaultdict(int)
-        for word in words:
-            if len(word) >= 3 and word not in ALL_STOPWORDS:
-                freq[word] += 1
+        freq = Counter(word for word in words if word not in ALL_STOPWORDS)
         
-        # Return top keywords
-        return [word for word, _ in sorted(freq.items(), key=lambda x: (-x[1], x[0]))[:k]]
+        # Return top keywords, most frequent first and alphabetical among ties
+        return [word for word, _ in heapq.nsmallest(k, freq.items(), key=lambda x: (-x[1], x[0]))]
     
-    def categorize_by_content(self, text: str) -> str:
+    def categorize_by_content(self, text: str, text_lower: Optional[str] = None) -> str:
         """Categorize medical content by specialty."""
-        text_lower = text.lower()
-        
-        # Define specialty patterns
-        specialties = {
-            'cardiology': ['heart', 'cardiac', 'cardiovascular', 'coronary', 'artery', 'valve'],
-            'neurology': ['brain', 'neurolog', 'seizure', 'stroke', 'cerebral', 'neural'],
-            'pediatrics': ['child', 'pediatric', 'infant', 'neonatal', 'growth', 'development'],
-            'urology': ['kidney', 'renal', 'urine', 'bladder', 'urinary', 'nephro'],
-            'endocrinology': ['hormone', 'diabetes', 'thyroid', 'endocrine', 'insulin'],
-            'dermatology': ['skin', 'rash', 'derma', 'lesion', 'cutaneous'],
-            'gastroenterology': ['stomach', 'intestine', 'liver', 'digestive', 'gastro'],
-            'pulmonology': ['lung', 'respiratory', 'asthma', 'pneumonia', 'breathing'],
-            'rheumatology': ['arthritis', 'joint', 'rheumatic', 'autoimmune', 'inflammation'],
-            'oncology': ['cancer', 'tumor', 'malignant', 'oncology', 'chemotherapy'],
-            'immunology': ['immune', 'allergy', 'antibody', 'immunologic', 'hypersensitivity'],
-            'psychiatry': ['depression', 'anxiety', 'psychiatric', 'mental', 'behavioral'],
-            'orthopedics': ['bone', 'fracture', 'orthopedic', 'musculoskeletal', 'joint'],
-            'emergency': ['emergency', 'trauma', 'acute', 'critical', 'resuscitation'],
-            'genetics': ['genetic', 'chromosome', 'hereditary', 'mutation', 'genomic']
-        }
-        
-        specialty_scores = {}
-        for specialty, keywords in specialties.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                specialty_scores[specialty] = score
-        
-        if specialty_scores:
-            return max(specialty_scores, key=specialty_scores.get)
-        return 'general'
+        if text_lower is None:
+            text_lower = text.lower()
+        # keyword -> specialty indexes, one entry per distinct keyword found
+        found = dict(hit for _, hit in SPECIALTY_AUTOMATON.iter(text_lower))
+        if not found:
+            return 'general'
+        
+        # each distinct keyword scores once for every specialty it belongs to
+        scores = [0] * len(SPECIALTY_NAMES)
+        for specialty_indexes in found.values():
+            for index in specialty_indexes:
+                scores[index] += 1
+        
+        # max() keeps the first of equal scores, i.e. SPECIALTIES order
+        return SPECIALTY_NAMES[max(range(len(scores)), key=scores.__getitem__)]
     
-    def merge_fragments(self, records: List[Dict]) -> List[Dict]:
-        """Merge text fragments that belong together."""
-        merged_records = []
-        current_group = []
+    def merge_fragments(self, records: Iterable[RawRecord]) -> Iterator[Tuple[Dict, str]]:
+        """Merge text fragments that belong together.
+        
+        Yields each record once it is complete, together with the text of its first
+        fragment, which its specialty, keywords and confidence are computed from.
+        """
+        # The record being built is kept as its first raw record, its fragment texts
+        # and a running token count; the record dict and its joined text are only
+        # built once it is complete, instead of re-concatenating on every merge
+        lead = None
+        fragments = []
+        token_count = 0
         
         for record in records:
-            text = record.get('text', '').strip()
-            source = record.get('source_file', '')
-            page = record.get('page_number', '')
+            text = record.text.strip()
+            source = record.source_file
+            word_count = len(text.split())
             
             # Skip if empty or artifact
-            if not text or self.is_artifact_record(text):
+            if record.is_artifact:
                 self.stats['removed_artifacts'] += 1
                 continue
             
             # Check if this should be merged with previous
             should_merge = False
-            if current_group:
-                last_record = current_group[-1]
-                last_text = last_record.get('text', '')
+            if lead is not None:
+                # the merged text ends with the last fragment
+                last_text = fragments[-1]
                 
                 # Merge criteria
-                same_source = last_record.get('source_file') == source
-                adjacent_page = abs(int(page or 0) - int(last_record.get('page_number', 0) or 0)) <= 1
+                same_source = lead.source_file == source
+                adjacent_page = (record.page is not None and lead.page is not None and
+                                 abs(record.page - lead.page) <= 1)
                 text_continues = (
                     last_text.endswith(('-', 'the ', 'and ', 'of ', 'in ', 'to ', 'with ')) or
                     not last_text.endswith('.') or
                     text.startswith(('ing ', 'ed ', 'er ', 'tion ', 'ly '))
                 )
-                short_fragment = len(text.split()) < 20
+                short_fragment = word_count < 20
                 
                 should_merge = same_source and (adjacent_page or text_continues or short_fragment)
             
-            if should_merge and current_group:
-                # Merge with last record in group
-                last_record = current_group[-1]
-                merged_text = last_record['text'] + ' ' + text
-                last_record['text'] = merged_text
-                last_record['chunk_token_count'] = len(merged_text.split())
+            if should_merge:
+                # Merge with the record being built
+                fragments.append(text)
+                token_count += word_count
                 self.stats['merged_fragments'] += 1
             else:
-                # Start new record or group
-                if current_group and len(current_group) >= 1:
-                    # Finalize current group
-                    for group_record in current_group:
-                        merged_records.append(group_record)
-                    current_group = []
-                
-                # Create new record
-                cleaned_record = {
-                    'id': str(uuid.uuid4()),
-                    'text': text,
-                    'page_number': page,
-                    'source_file': source,
-                    'chunk_token_count': len(text.split()),
-                    'medical_specialty': self.categorize_by_content(text),
-                    'keywords': ', '.join(self.extract_keywords(text)),
-                    'confidence_score': self.calculate_confidence(text),
-                    'created_at': datetime.now().isoformat()
-                }
-                current_group = [cleaned_record]
-        
-        # Add remaining group
-        if current_group:
-            merged_records.extend(current_group)
-        
-        return merged_records
+                # Finalize the current record and start a new one
+                if lead is not None:
+                    yield self.build_record(lead, fragments, token_count), lead.text
+                lead = record
+                fragments = [text]
+                token_count = word_count
+        
+        # Add remaining record
+        if lead is not None:
+            yield self.build_record(lead, fragments, token_count), lead.text
+    
+    def build_record(self, lead: RawRecord, fragments: List[str], token_count: int) -> Dict:
+        """Create the output record for a completed group of fragments; enrich_records fills in the rest."""
+        return {
+            'id': None,  # derived from the finished record in enrich_records
+            'text': ' '.join(fragments),
+            'page_number': lead.page_number,
+            'source_file': lead.source_file,
+            'chunk_token_count': token_count,
+            'created_at': self.created_at
+        }
     
-    def calculate_confidence(self, text: str) -> float:
+    def record_id(self, record: Dict) -> str:
+        """Deterministic UUID-formatted id from a merged record's source, page and text."""
+        key = f"{record['source_file']}|{record['page_number']}|{record['text']}"
+        return str(uuid.UUID(hex=xxhash.xxh3_128_hexdigest(key.encode('utf-8'))))
+    
+    def enrich_records(self, pool: Pool, records: Iterable[Tuple[Dict, str]]) -> Iterator[Dict]:
+        """Add id, specialty, keywords and confidence to merged records, computed in the pool in batches."""
+        records = iter(records)
+        while True:
+            batch = list(islice(records, ENRICH_BATCH_SIZE))
+            if not batch:
+                return
+            enrichments = pool.map(enrich_text, [lead_text for _, lead_text in batch], chunksize=POOL_CHUNKSIZE)
+            for (record, _), (specialty, keywords, confidence) in zip(batch, enrichments):
+                record['id'] = self.record_id(record)
+                record['medical_specialty'] = specialty
+                record['keywords'] = keywords
+                record['confidence_score'] = confidence
+                yield record
+    
+    def calculate_confidence(self, text: str, text_lower: Optional[str] = None) -> float:
         """Calculate confidence score for text quality."""
         if not text:
             return 0.0
@@ -239,79 +351,111 @@ class MedicalDocumentProcessor:
             score += 0.1
         
         # Medical content bonus
-        medical_terms = ['patient', 'treatment', 'diagnosis', 'symptoms', 'therapy', 'clinical']
-        medical_score = sum(1 for term in medical_terms if term.lower() in text.lower())
+        if text_lower is None:
+            text_lower = text.lower()
+        medical_score = sum(1 for term in MEDICAL_TERMS if term in text_lower)
         score += min(medical_score * 0.05, 0.15)
         
         # Penalize artifacts
-        if any(pattern.search(text) for pattern in PAGE_ARTIFACT_PATTERNS):
+        if PAGE_ARTIFACT_PATTERN.match(text):
             score -= 0.2
         
         return min(max(score, 0.0), 1.0)
     
-    def remove_duplicates(self, records: List[Dict]) -> List[Dict]:
+    def remove_duplicates(self, records: Iterable[Dict]) -> Iterator[Dict]:
         """Remove duplicate records based on text similarity."""
-        seen_texts = set()
-        unique_records = []
+        # 64-bit fingerprints of the signatures instead of the signature strings
+        seen_texts: Set[int] = set()
         
         for record in records:
             text = record.get('text', '').strip().lower()
             # Create a signature of the text
-            text_signature = re.sub(r'\W+', '', text)[:200]  # First 200 characters, alphanumeric only
+            signature = text.translate(NON_WORD_DELETE)[:200]  # First 200 characters, alphanumeric only
+            text_signature = xxhash.xxh3_64_intdigest(signature.encode('utf-8'))
             
             if text_signature not in seen_texts:
                 seen_texts.add(text_signature)
-                unique_records.append(record)
+                self.unique_count += 1
+                yield record
             else:
                 self.stats['duplicates_removed'] += 1
-        
-        return unique_records
+    
+    def read_rows(self, input_file: str) -> Iterator[Tuple[bytes, ...]]:
+        """Yield the raw (text, page_number, source_file) values of each input row, parsed by Arrow."""
+        # Columns are read as bytes and decoded by the workers, dropping invalid
+        # UTF-8 the way the text-mode reader with errors='ignore' did
+        reader = pacsv.open_csv(
+            input_file,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=INPUT_COLUMNS,
+                include_missing_columns=True,
+                column_types={name: pa.binary() for name in INPUT_COLUMNS}
+            )
+        )
+        for batch in reader:
+            yield from zip(*(batch.column(name).to_pylist() for name in INPUT_COLUMNS))
+    
+    def read_records(self, pool: Pool, input_file: str) -> Iterator[RawRecord]:
+        """Yield cleaned raw records from the input CSV rows, cleaned in order by the pool."""
+        # One READ_BATCH_SIZE block of rows at a time through pool.map, so only the
+        # current block is read ahead of what the merge step has consumed
+        rows = self.read_rows(input_file)
+        while True:
+            batch = list(islice(rows, READ_BATCH_SIZE))
+            if not batch:
+                return
+            for text, page_number, source, removed_copyright, is_artifact, page in pool.map(prepare_row, batch, chunksize=POOL_CHUNKSIZE):
+                self.stats['total_records'] += 1
+                self.stats['removed_copyright'] += removed_copyright
+                yield RawRecord(text, page_number, source, is_artifact, page)
+    
+    def filter_quality(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Filter out low-quality records."""
+        for record in records:
+            if record['confidence_score'] >= 0.3:
+                self.stats['cleaned_records'] += 1
+                yield record
+    
+    def write_records(self, records: Iterable[Dict], output_file: str) -> None:
+        """Write records as Parquet (zstd) if output_file ends in .parquet, otherwise as CSV."""
+        if output_file.endswith('.parquet'):
+            records = iter(records)
+            with pq.ParquetWriter(output_file, OUTPUT_SCHEMA, compression='zstd') as writer:
+                while True:
+                    batch = list(islice(records, PARQUET_BATCH_SIZE))
+                    if not batch:
+                        break
+                    writer.write_table(pa.Table.from_pylist(batch, schema=OUTPUT_SCHEMA))
+        else:
+            with open(output_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=OUTPUT_SCHEMA.names)
+                writer.writeheader()
+                writer.writerows(records)
     
     def process_dataset(self, input_file: str, output_file: str) -> None:
         """Main processing function."""
         print(f"Processing medical documents dataset: {input_file}")
         
-        raw_records = []
-        
-        # Read input CSV
-        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                self.stats['total_records'] += 1
-                raw_records.append({
-                    'text': self.clean_text(row.get('text', '')),
-                    'page_number': row.get('page_number', ''),
-                    'source_file': row.get('source_file', '')
-                })
-        
-        print(f"Read {len(raw_records)} raw records")
-        
-        # Process records
-        merged_records = self.merge_fragments(raw_records)
-        print(f"After merging fragments: {len(merged_records)} records")
-        
-        unique_records = self.remove_duplicates(merged_records)
-        print(f"After removing duplicates: {len(unique_records)} records")
-        
-        # Filter out low-quality records
-        quality_records = [r for r in unique_records if r['confidence_score'] >= 0.3]
-        print(f"After quality filtering: {len(quality_records)} records")
-        
-        self.stats['cleaned_records'] = len(quality_records)
-        
-        # Write output CSV
-        fieldnames = [
-            'id', 'text', 'page_number', 'source_file', 'medical_specialty',
-            'keywords', 'chunk_token_count', 'confidence_score', 'created_at'
-        ]
-        
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(quality_records)
+        # Read, merge, deduplicate, filter and write as one streaming pipeline, so
+        # only one block of rows, the current record group and the dedup
+        # signatures stay in memory.
+        # Cleaning and enrichment are per-record and run in the pool; merging and
+        # deduplication depend on the previous records and stay in this process.
+        with Pool(os.cpu_count(), initializer=init_worker) as pool:
+            raw_records = self.read_records(pool, input_file)
+            merged_records = self.enrich_records(pool, self.merge_fragments(raw_records))
+            unique_records = self.remove_duplicates(merged_records)
+            self.write_records(self.filter_quality(unique_records), output_file)
+        
+        print(f"Read {self.stats['total_records']} raw records")
+        print(f"After merging fragments: {self.unique_count + self.stats['duplicates_removed']} records")
+        print(f"After removing duplicates: {self.unique_count} records")
+        print(f"After quality filtering: {self.stats['cleaned_records']} records")
         
         # Write processing statistics
-        stats_file = output_file.replace('.csv', '_processing_stats.json')
+        stats_file = os.path.splitext(output_file)[0] + '_processing_stats.json'
         with open(stats_file, 'w') as f:
             json.dump(self.stats, f, indent=2)
         
@@ -331,6 +475,42 @@ class MedicalDocumentProcessor:
             print(f"Retention Rate: {retention_rate:.1f}%")
 
 
+# Processor used by each pool worker, created by init_worker
+WORKER_PROCESSOR = None
+
+
+def init_worker() -> None:
+    """Create one processor per pool worker"""
+    global WORKER_PROCESSOR
+    WORKER_PROCESSOR = MedicalDocumentProcessor()
+
+
+def prepare_row(row: Tuple[Optional[bytes], ...]) -> Tuple[str, str, str, int, bool, Optional[int]]:
+    """Clean one input row; returns (text, page_number, source_file, removed_copyright, is_artifact, page)"""
+    # missing input columns come through as None
+    text, page_number, source = ((value or b'').decode('utf-8', 'ignore') for value in row)
+    stats = WORKER_PROCESSOR.stats
+    copyright_before = stats['removed_copyright']
+    text = WORKER_PROCESSOR.clean_text(text)
+    is_artifact = not text or WORKER_PROCESSOR.is_artifact_record(text)
+    # parse the page once here instead of on every merge check; a blank page counts as 0
+    try:
+        page = int(page_number or 0)
+    except ValueError:
+        page = None
+    return text, page_number, source, stats['removed_copyright'] - copyright_before, is_artifact, page
+
+
+@lru_cache(maxsize=ENRICH_CACHE_SIZE)
+def enrich_text(text: str) -> Tuple[str, str, float]:
+    """Compute (medical_specialty, keywords, confidence_score) for a record's lead text"""
+    # lowercase once and share it with all three
+    text_lower = text.lower()
+    return (WORKER_PROCESSOR.categorize_by_content(text, text_lower=text_lower),
+            ', '.join(WORKER_PROCESSOR.extract_keywords(text, text_lower=text_lower)),
+            WORKER_PROCESSOR.calculate_confidence(text, text_lower=text_lower))
+
+
 def main():
     parser = argparse.ArgumentParser(description='Process medical documents dataset')
     parser.add_argument('input_file', help='Input CSV file path')
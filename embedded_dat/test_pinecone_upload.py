@@ -9,6 +9,18 @@ from datetime import datetime
 from pinecone import Pinecone, ServerlessSpec
 from sentence_transformers import SentenceTransformer
 
+ENCODE_BATCH_SIZE = 64
+UPSERT_BATCH_SIZE = 100
+UPSERT_POOL_THREADS = 8
+# Index readiness polling backs off from the first delay up to the cap (seconds)
+INDEX_READY_POLL_DELAY = 0.25
+INDEX_READY_POLL_MAX_DELAY = 4.0
+
+def chunks(items, size):
+    """Yield successive slices of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 def test_pinecone_upload():
     """Test upload with just 5 records"""
     
@@ -40,16 +52,19 @@ def test_pinecone_upload():
         pc.create_index(
             name=index_name,
             dimension=384,
-            metric="cosine",
+            metric="dotproduct",  # embeddings are normalized below, so this ranks as cosine
             spec=ServerlessSpec(cloud="aws", region="us-east-1")
         )
         
         # Wait for index to be ready
         import time
+        delay = INDEX_READY_POLL_DELAY
         while not pc.describe_index(index_name).status['ready']:
-            time.sleep(1)
+            time.sleep(delay)
+            delay = min(delay * 2, INDEX_READY_POLL_MAX_DELAY)
     
-    index = pc.Index(index_name)
+    # pool_threads lets upsert(async_req=True) send batches concurrently
+    index = pc.Index(index_name, pool_threads=UPSERT_POOL_THREADS)
     
     # Load first 5 records from dataset
     print("📖 Loading test records...")
@@ -70,15 +85,23 @@ def test_pinecone_upload():
         combined_text = f"{record.get('text', '')} {record.get('medical_specialty', '')} {record.get('keywords', '')}"
         texts.append(combined_text[:8000])
     
-    embeddings = model.encode(texts, convert_to_tensor=False)
+    embeddings = model.encode(
+        texts,
+        batch_size=ENCODE_BATCH_SIZE,
+        show_progress_bar=False,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
     
     # Prepare vectors
     print("🔧 Preparing vectors...")
     vectors = []
-    for i, record in enumerate(records):
+    # one C-level conversion of the whole batch instead of one per row
+    embedding_lists = embeddings.tolist()
+    for i, (record, values) in enumerate(zip(records, embedding_lists)):
         vector = {
             'id': f"test_{i}_{record.get('id', '')}",
-            'values': embeddings[i].tolist(),
+            'values': values,
             'metadata': {
                 'medical_specialty': record.get('medical_specialty', ''),
                 'confidence_score': float(record.get('confidence_score', 0.5)),
@@ -89,9 +112,14 @@ def test_pinecone_upload():
         }
         vectors.append(vector)
     
-    # Upload vectors
+    # Upload vectors in batches, keeping several requests in flight at once
     print("🚀 Uploading test vectors...")
-    index.upsert(vectors=vectors)
+    async_results = [
+        index.upsert(vectors=batch, async_req=True)
+        for batch in chunks(vectors, UPSERT_BATCH_SIZE)
+    ]
+    for async_result in async_results:
+        async_result.get()
     
     # Test search
     print("🔍 Testing search...")
@@ -7,9 +7,29 @@ Free hosting and sharing for your medical search system!
 import json
 import numpy as np
 import pandas as pd
-from datasets import Dataset
+from datasets import Dataset, concatenate_datasets
 import os
 
+# Records whose memory-mapped embeddings are converted to Python lists at a time
+DATASET_SLICE_SIZE = 10000
+
+def build_dataset(embeddings, metadata):
+    """Build the Dataset slice by slice, so only one slice of embeddings is ever held as lists"""
+    parts = []
+    for start in range(0, len(metadata), DATASET_SLICE_SIZE):
+        items = metadata[start:start + DATASET_SLICE_SIZE]
+        parts.append(Dataset.from_dict({
+            'id': [item['id'] for item in items],
+            'medical_specialty': [item['medical_specialty'] for item in items],
+            'confidence_score': [item['confidence_score'] for item in items],
+            'source_dataset': [item['source_dataset'] for item in items],
+            'keywords': [item['keywords'] for item in items],
+            'text_preview': [item['full_text'][:200] for item in items],
+            'full_text': [item['full_text'] for item in items],
+            'embeddings': embeddings[start:start + DATASET_SLICE_SIZE].tolist()
+        }))
+    return concatenate_datasets(parts)
+
 def prepare_dataset():
     """Prepare dataset for Hugging Face Hub"""
     print("🤗" * 20)
@@ -21,39 +41,34 @@ def prepare_dataset():
         print("❌ No embeddings found! Run fast_hf_embeddings.py first.")
         return None
     
-    if not os.path.exists('fast_medical_metadata.json'):
+    if not os.path.exists('fast_medical_metadata.parquet'):
         print("❌ No metadata found! Run fast_hf_embeddings.py first.")
         return None
     
     # Load data
     print("📥 Loading embeddings and metadata...")
-    embeddings = np.load('fast_medical_embeddings.npy')
+    embeddings = np.load('fast_medical_embeddings.npy', mmap_mode='r')
+    
+    metadata = pd.read_parquet('fast_medical_metadata.parquet').to_dict('records')
     
-    with open('fast_medical_metadata.json', 'r') as f:
-        metadata = json.load(f)
+    # Full texts live in a separate blob indexed by row offsets
+    offsets = np.load('fast_medical_full_text_offsets.npy', mmap_mode='r')
+    with open('fast_medical_full_texts.bin', 'rb') as f:
+        blob = f.read()
+    for i, item in enumerate(metadata):
+        item['full_text'] = blob[offsets[i]:offsets[i + 1]].decode('utf-8')
     
     print(f"✅ Loaded {len(embeddings)} embeddings with {embeddings.shape[1]} dimensions")
     
     # Prepare dataset dictionary
     print("🔧 Preparing dataset...")
     
-    dataset_dict = {
-        'id': [item['id'] for item in metadata],
-        'medical_specialty': [item['medical_specialty'] for item in metadata],
-        'confidence_score': [item['confidence_score'] for item in metadata],
-        'source_dataset': [item['source_dataset'] for item in metadata],
-        'keywords': [item['keywords'] for item in metadata],
-        'text_preview': [item['text_preview'] for item in metadata],
-        'full_text': [item['full_text'] for item in metadata],
-        'embeddings': embeddings.tolist()  # Convert to list for JSON serialization
-    }
-    
     # Create dataset
-    dataset = Dataset.from_dict(dataset_dict)
+    dataset = build_dataset(embeddings, metadata)
     
     print(f"📊 Dataset created:")
     print(f"  - Records: {len(dataset):,}")
-    print(f"  - Embedding dimensions: {len(dataset_dict['embeddings'][0])}")
+    print(f"  - Embedding dimensions: {embeddings.shape[1]}")
     print(f"  - Features: {list(dataset.features.keys())}")
     
     return dataset
@@ -7,10 +7,30 @@ Completely free hosting and sharing!
 import json
 import numpy as np
 import pandas as pd
-from datasets import Dataset, DatasetDict
+from datasets import Dataset, DatasetDict, concatenate_datasets
 from huggingface_hub import HfApi, login
 import os
 
+# Records whose memory-mapped embeddings are converted to Python lists at a time
+DATASET_SLICE_SIZE = 10000
+
+def build_dataset(embeddings, metadata):
+    """Build the Dataset slice by slice, so only one slice of embeddings is ever held as lists"""
+    parts = []
+    for start in range(0, len(metadata), DATASET_SLICE_SIZE):
+        items = metadata[start:start + DATASET_SLICE_SIZE]
+        parts.append(Dataset.from_dict({
+            'id': [item['id'] for item in items],
+            'medical_specialty': [item['medical_specialty'] for item in items],
+            'confidence_score': [item['confidence_score'] for item in items],
+            'source_dataset': [item['source_dataset'] for item in items],
+            'keywords': [item['keywords'] for item in items],
+            'text_preview': [item['full_text'][:200] for item in items],
+            'full_text': [item['full_text'] for item in items],
+            'embeddings': embeddings[start:start + DATASET_SLICE_SIZE].tolist()
+        }))
+    return concatenate_datasets(parts)
+
 def upload_to_hf_hub():
     """Upload embeddings and metadata to Hugging Face Hub"""
     print("🤗" * 20)
@@ -28,7 +48,7 @@ def upload_to_hf_hub():
     
     # Load embeddings and metadata
     print("📥 Loading embeddings and metadata...")
-    embeddings = np.load('godzilla_medical_embeddings.npy')
+    embeddings = np.load('godzilla_medical_embeddings.npy', mmap_mode='r')
     
     with open('godzilla_medical_metadata.json', 'r') as f:
         metadata = json.load(f)
@@ -38,33 +58,18 @@ def upload_to_hf_hub():
     # Prepare dataset
     print("🔧 Preparing dataset for upload...")
     
-    # Convert embeddings to list format for datasets
-    embeddings_list = embeddings.tolist()
-    
-    # Create dataset dictionary
-    dataset_dict = {
-        'id': [item['id'] for item in metadata],
-        'medical_specialty': [item['medical_specialty'] for item in metadata],
-        'confidence_score': [item['confidence_score'] for item in metadata],
-        'source_dataset': [item['source_dataset'] for item in metadata],
-        'keywords': [item['keywords'] for item in metadata],
-        'text_preview': [item['text_preview'] for item in metadata],
-        'full_text': [item['full_text'] for item in metadata],
-        'embeddings': embeddings_list
-    }
-    
     # Create Hugging Face Dataset
-    dataset = Dataset.from_dict(dataset_dict)
+    dataset = build_dataset(embeddings, metadata)
     
     print(f"📊 Dataset created with {len(dataset)} records")
-    print(f"📐 Embedding dimensions: {len(embeddings_list[0])}")
+    print(f"📐 Embedding dimensions: {embeddings.shape[1]}")
     
     # Dataset info
     dataset_info = {
         'description': 'Godzilla Medical Dataset with BioBERT embeddings for semantic search',
         'total_records': len(dataset),
         'embedding_model': 'microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract',
-        'embedding_dimensions': len(embeddings_list[0]),
+        'embedding_dimensions': embeddings.shape[1],
         'medical_specialties': list(set([item['medical_specialty'] for item in metadata])),
         'source_datasets': list(set([item['source_dataset'] for item in metadata]))
     }
@@ -93,24 +98,12 @@ def upload_with_username(username):
     """Upload to HF Hub with username"""
     try:
         # Load dataset
-        embeddings = np.load('godzilla_medical_embeddings.npy')
+        embeddings = np.load('godzilla_medical_embeddings.npy', mmap_mode='r')
         with open('godzilla_medical_metadata.json', 'r') as f:
             metadata = json.load(f)
         
         # Prepare dataset
-        embeddings_list = embeddings.tolist()
-        dataset_dict = {
-            'id': [item['id'] for item in metadata],
-            'medical_specialty': [item['medical_specialty'] for item in metadata],
-            'confidence_score': [item['confidence_score'] for item in metadata],
-            'source_dataset': [item['source_dataset'] for item in metadata],
-            'keywords': [item['keywords'] for item in metadata],
-            'text_preview': [item['text_preview'] for item in metadata],
-            'full_text': [item['full_text'] for item in metadata],
-            'embeddings': embeddings_list
-        }
-        
-        dataset = Dataset.from_dict(dataset_dict)
+        dataset = build_dataset(embeddings, metadata)
         
         # Upload to Hub
         repo_name = f"{username}/godzilla-medical-embeddings"
@@ -166,7 +159,7 @@ def search_medical_records(query, top_k=5):
         results.append({
             "similarity": float(similarities[idx]),
             "specialty": metadata["medical_specialty"][idx],
-            "text": metadata["text_preview"][idx],
+            "text": metadata["full_text"][idx][:200],
             "keywords": metadata["keywords"][idx]
         })
     
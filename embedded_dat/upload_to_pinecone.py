@@ -9,8 +9,16 @@ import json
 import sys
 import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from itertools import islice
+from collections import deque
 import hashlib
+import queue
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 
 # Try to import required libraries
 try:
@@ -20,16 +28,76 @@ except ImportError:
     os.system("pip install pinecone")
     from pinecone import Pinecone, ServerlessSpec
 
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    print("❌ SentenceTransformers library not found. Installing...")
-    os.system("pip install sentence-transformers")
-    from sentence_transformers import SentenceTransformer
-
 # Increase CSV field size limit
 csv.field_size_limit(sys.maxsize)
 
+# Upsert requests Pinecone's client keeps in flight at once (upsert with async_req=True),
+# and how many submitted batches may wait for their result before we block on the oldest
+UPSERT_POOL_THREADS = 30
+MAX_PENDING_UPSERTS = UPSERT_POOL_THREADS * 2
+
+# Records read, embedded and turned into vectors per streaming step, so only
+# this many records (plus the upserts in flight) are held in memory at a time
+EMBED_CHUNK_SIZE = 4096
+
+# Embedded chunks a background thread may have ready ahead of the upload loop;
+# embedding keeps running while upserts are sent and awaited, and stalls once
+# this many chunks (each EMBED_CHUNK_SIZE vectors) are waiting
+EMBED_QUEUE_SIZE = 2
+
+# Texts per encode batch; a GPU running the model in FP16 takes much larger batches
+CPU_BATCH_SIZE = 32
+GPU_BATCH_SIZE = 256
+
+# Decimal places embedding values are sent with. Upserts travel as JSON, where a
+# float32 written out as a double takes ~20 characters; 9 decimals is below float32
+# resolution for the unit-length vectors' typical values and cuts the payload ~40%
+EMBEDDING_DECIMALS = 9
+
+# Bytes parsed per Arrow CSV block (a whole row must fit in one)
+CSV_BLOCK_SIZE = 16 << 20
+
+# One upsert entry: (id, values, metadata), the tuple form Pinecone's upsert takes
+Vector = Tuple[str, List[float], Dict[str, Any]]
+
+# Numeric metadata columns, parsed to numbers while reading the CSV, with the
+# value used for blank cells and missing columns
+NUMERIC_COLUMNS = {
+    'confidence_score': (pa.float64(), 0.5),
+    'clinical_relevance_score': (pa.float64(), 0.5),
+    'chunk_token_count': (pa.int64(), 0)
+}
+
+def chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Yield successive lists of at most size items"""
+    it = iter(items)
+    chunk = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
+
+def prefetch(items: Iterable, size: int) -> Iterator:
+    """Iterate items on a background thread, keeping at most size of them ready in a bounded queue"""
+    ready = queue.Queue(maxsize=size)
+    
+    def produce():
+        try:
+            for item in items:
+                ready.put((True, item))
+            ready.put((False, None))
+        except BaseException as e:
+            ready.put((False, e))
+    
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        ok, item = ready.get()
+        if ok:
+            yield item
+        elif item is None:
+            return
+        else:
+            raise item
+
 class GodzillaPineconeUploader:
     def __init__(self, api_key: str = None, environment: str = "us-east-1-aws"):
         """
@@ -44,6 +112,7 @@ class GodzillaPineconeUploader:
         self.pc = None
         self.index = None
         self.model = None
+        self.batch_size = CPU_BATCH_SIZE
         
         if not self.api_key:
             raise ValueError("❌ Pinecone API key required. Set PINECONE_API_KEY environment variable or pass api_key parameter")
@@ -58,11 +127,38 @@ class GodzillaPineconeUploader:
             print(f"❌ Failed to connect to Pinecone: {e}")
             raise
     
-    def initialize_embedding_model(self, model_name: str = "all-MiniLM-L6-v2"):
-        """Initialize the sentence transformer model for embeddings"""
-        print(f"🤖 Loading embedding model: {model_name}")
+    def initialize_embedding_model(self, model_name: str = "all-MiniLM-L6-v2", backend: str = "torch"):
+        """Initialize the sentence transformer model for embeddings
+        
+        Args:
+            model_name: Sentence transformer model name
+            backend: "torch", or "onnx"/"openvino" to run the exported model through
+                ONNX Runtime/OpenVINO, usually several times faster on CPU
+        """
+        print(f"🤖 Loading embedding model: {model_name} ({backend} backend)")
+        
+        # Imported here rather than at module level, so --help and the CSV and
+        # Pinecone setup don't wait for PyTorch to load
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("❌ SentenceTransformers library not found. Installing...")
+            os.system("pip install sentence-transformers")
+            from sentence_transformers import SentenceTransformer
+        import torch
+        
         try:
-            self.model = SentenceTransformer(model_name)
+            if backend == "torch":
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                self.model = SentenceTransformer(model_name, device=device)
+                if device == "cuda":
+                    # FP16 weights run on the tensor cores; create_embeddings widens the output
+                    self.model.half()
+                    self.batch_size = GPU_BATCH_SIZE
+                print(f"💻 Device: {device}")
+            else:
+                # needs sentence-transformers >= 3.2 with the onnx or openvino extra
+                self.model = SentenceTransformer(model_name, backend=backend)
             print("✅ Embedding model loaded successfully")
         except Exception as e:
             print(f"❌ Failed to load embedding model: {e}")
@@ -79,13 +175,13 @@ class GodzillaPineconeUploader:
             
             if index_name in index_names:
                 print(f"✅ Index '{index_name}' already exists, connecting...")
-                self.index = self.pc.Index(index_name)
+                self.index = self.pc.Index(index_name, pool_threads=UPSERT_POOL_THREADS)
             else:
                 print(f"🆕 Creating new index '{index_name}'...")
                 self.pc.create_index(
                     name=index_name,
                     dimension=dimension,
-                    metric="cosine",
+                    metric="dotproduct",  # vectors are uploaded unit-length, so this ranks as cosine
                     spec=ServerlessSpec(
                         cloud="aws",
                         region=self.environment.split('-')[0] + "-" + self.environment.split('-')[1] + "-" + self.environment.split('-')[2]
@@ -97,7 +193,7 @@ class GodzillaPineconeUploader:
                 while not self.pc.describe_index(index_name).status['ready']:
                     time.sleep(1)
                 
-                self.index = self.pc.Index(index_name)
+                self.index = self.pc.Index(index_name, pool_threads=UPSERT_POOL_THREADS)
                 print("✅ Index created and ready!")
             
             # Get index stats
@@ -108,118 +204,184 @@ class GodzillaPineconeUploader:
             print(f"❌ Failed to setup index: {e}")
             raise
     
-    def load_godzilla_dataset(self, csv_file: str = "godzilla_medical_dataset.csv") -> List[Dict]:
-        """Load the Godzilla medical dataset from CSV"""
+    def load_godzilla_dataset(self, csv_file: str = "godzilla_medical_dataset.csv") -> Iterator[pa.RecordBatch]:
+        """Load the Godzilla medical dataset from CSV, streaming it in record batches"""
         print(f"📖 Loading Godzilla dataset from {csv_file}...")
         
         if not os.path.exists(csv_file):
             raise FileNotFoundError(f"❌ Dataset file not found: {csv_file}")
         
-        records = []
+        return self.read_batches(csv_file)
+    
+    def read_batches(self, csv_file: str) -> Iterator[pa.RecordBatch]:
+        """Yield the dataset as Arrow record batches of at most EMBED_CHUNK_SIZE rows"""
+        count = 0
         try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    records.append(row)
+            with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+                fieldnames = next(csv.reader(f), [])
             
-            print(f"✅ Loaded {len(records):,} records from dataset")
-            return records
+            if fieldnames:
+                # Text columns stay strings (blank cells as ''); numeric ones are typed up front
+                column_types = {name: pa.string() for name in fieldnames}
+                for name in fieldnames:
+                    if name in NUMERIC_COLUMNS:
+                        column_types[name] = NUMERIC_COLUMNS[name][0]
+                
+                reader = pacsv.open_csv(
+                    csv_file,
+                    read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+                    parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                    convert_options=pacsv.ConvertOptions(column_types=column_types, strings_can_be_null=False)
+                )
+                names = reader.schema.names
+                for batch in reader:
+                    batch = pa.RecordBatch.from_arrays([
+                        pc.fill_null(column, NUMERIC_COLUMNS[name][1]) if name in NUMERIC_COLUMNS else column
+                        for name, column in zip(names, batch.columns)
+                    ], names=names)
+                    for offset in range(0, batch.num_rows, EMBED_CHUNK_SIZE):
+                        chunk = batch.slice(offset, EMBED_CHUNK_SIZE)
+                        count += chunk.num_rows
+                        yield chunk
+            
+            print(f"✅ Loaded {count:,} records from dataset")
             
         except Exception as e:
             print(f"❌ Failed to load dataset: {e}")
             raise
     
-    def create_embeddings(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+    def create_embeddings(self, texts: List[str], batch_size: int = None) -> List[List[float]]:
         """Create embeddings for a list of texts"""
         print(f"🧠 Creating embeddings for {len(texts)} texts...")
         
+        import torch  # already loaded by initialize_embedding_model
+        
         try:
-            embeddings = []
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                batch_embeddings = self.model.encode(batch, convert_to_tensor=False)
-                embeddings.extend(batch_embeddings.tolist())
-                
-                if (i // batch_size + 1) % 10 == 0:
-                    print(f"   Processed {i + len(batch):,}/{len(texts):,} texts...")
+            # Encode each distinct text once; repeated chunks (page boilerplate,
+            # disclaimers) get the row of their first occurrence
+            unique_texts = {text: row for row, text in enumerate(dict.fromkeys(texts))}
+            
+            # One encode call over all the texts: SentenceTransformer sorts them by
+            # length before cutting batch_size batches, so each batch is padded only
+            # to similar lengths, and returns the embeddings in input order
+            with torch.inference_mode():
+                embeddings = self.model.encode(list(unique_texts), batch_size=batch_size or self.batch_size,
+                                               convert_to_tensor=False, show_progress_bar=False,
+                                               normalize_embeddings=True)
+            if len(unique_texts) < len(texts):
+                embeddings = embeddings[[unique_texts[text] for text in texts]]
             
             print("✅ Embeddings created successfully")
-            return embeddings
+            return embeddings.astype(np.float64).round(EMBEDDING_DECIMALS).tolist()
             
         except Exception as e:
             print(f"❌ Failed to create embeddings: {e}")
             raise
     
-    def prepare_vectors(self, records: List[Dict]) -> List[Dict]:
-        """Prepare vectors for Pinecone upload"""
+    def prepare_vectors(self, batches: Iterable[pa.RecordBatch]) -> Iterator[Vector]:
+        """Prepare vectors for Pinecone upload, embedding one record batch at a time"""
         print("🔧 Preparing vectors for upload...")
         
-        # Extract texts for embedding
-        texts = []
-        for record in records:
-            # Combine text with key metadata for better embeddings
-            combined_text = f"{record.get('text', '')} {record.get('medical_specialty', '')} {record.get('keywords', '')}"
-            texts.append(combined_text[:8000])  # Limit text length
+        # One upload timestamp for the whole run
+        uploaded_at = datetime.now().isoformat()
+        prepared = 0
+        
+        # Reading and embedding run on their own thread, so the model keeps
+        # encoding the next chunks while this one is being uploaded
+        chunks_ready = (self.prepare_vector_chunk(batch, uploaded_at) for batch in batches)
+        for chunk in prefetch(chunks_ready, EMBED_QUEUE_SIZE):
+            yield from chunk
+            prepared += len(chunk)
+        
+        print(f"✅ Prepared {prepared:,} vectors for upload")
+    
+    def prepare_vector_chunk(self, batch: pa.RecordBatch, uploaded_at: str) -> List[Vector]:
+        """Embed one record batch and build its vectors, with column-wise Arrow kernels"""
+        names = batch.schema.names
+        size = batch.num_rows
+        
+        def column(name, default=''):
+            if name in names:
+                return batch.column(name)
+            return pa.repeat(default, size)
+        
+        def truncated(name, length):
+            return pc.utf8_slice_codeunits(column(name), 0, length)
+        
+        # Combine text with key metadata for better embeddings, limiting the text length
+        texts = pc.utf8_slice_codeunits(
+            pc.binary_join_element_wise(column('text'), column('medical_specialty'), column('keywords'), ' '),
+            0, 8000
+        ).to_pylist()
         
         # Create embeddings
         embeddings = self.create_embeddings(texts)
         
-        # Prepare vectors
-        vectors = []
-        for i, record in enumerate(records):
-            # Create unique ID
-            vector_id = record.get('id', f"godzilla_{i}")
-            
-            # Prepare metadata (Pinecone has limits on metadata size)
-            metadata = {
-                'source_dataset': record.get('source_dataset', ''),
-                'medical_specialty': record.get('medical_specialty', ''),
-                'keywords': record.get('keywords', '')[:500],  # Limit keywords length
-                'confidence_score': float(record.get('confidence_score', 0.5)),
-                'page_number': record.get('page_number', ''),
-                'book_title': record.get('book_title', '')[:200],  # Limit title length
-                'chapter_title': record.get('chapter_title', '')[:200],
-                'age_groups': record.get('age_groups', ''),
-                'clinical_relevance_score': float(record.get('clinical_relevance_score', 0.5)),
-                'reading_difficulty': record.get('reading_difficulty', ''),
-                'chunk_token_count': int(record.get('chunk_token_count', 0)),
-                'text_preview': record.get('text', '')[:500],  # First 500 chars for preview
-                'created_at': record.get('created_at', ''),
-                'uploaded_at': datetime.now().isoformat()
-            }
-            
-            vector = {
-                'id': vector_id,
-                'values': embeddings[i],
-                'metadata': metadata
-            }
-            vectors.append(vector)
+        # Use the record's own id; without one, derive a stable id from the embedded
+        # text so re-running the upload overwrites the same vector instead of adding one
+        ids = [
+            record_id or hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+            for record_id, text in zip(column('id').to_pylist(), texts)
+        ]
+        
+        # Prepare metadata column by column (Pinecone has limits on metadata size)
+        metadata = pa.table({
+            'source_dataset': column('source_dataset'),
+            'medical_specialty': column('medical_specialty'),
+            'keywords': truncated('keywords', 500),  # Limit keywords length
+            'confidence_score': column('confidence_score', NUMERIC_COLUMNS['confidence_score'][1]),
+            'page_number': column('page_number'),
+            'book_title': truncated('book_title', 200),  # Limit title length
+            'chapter_title': truncated('chapter_title', 200),
+            'age_groups': column('age_groups'),
+            'clinical_relevance_score': column('clinical_relevance_score', NUMERIC_COLUMNS['clinical_relevance_score'][1]),
+            'reading_difficulty': column('reading_difficulty'),
+            'chunk_token_count': column('chunk_token_count', NUMERIC_COLUMNS['chunk_token_count'][1]),
+            'text_preview': truncated('text', 500),  # First 500 chars for preview
+            'created_at': column('created_at'),
+            'uploaded_at': pa.repeat(uploaded_at, size)
+        }).to_pylist()
         
-        print(f"✅ Prepared {len(vectors):,} vectors for upload")
-        return vectors
+        # Upsert tuples rather than an {'id', 'values', 'metadata'} dict per vector
+        return list(zip(ids, embeddings, metadata))
     
-    def upload_vectors(self, vectors: List[Dict], batch_size: int = 100):
-        """Upload vectors to Pinecone in batches"""
-        print(f"🚀 Uploading {len(vectors):,} vectors to Pinecone...")
+    def upload_vectors(self, vectors: Iterable[Vector], batch_size: int = 100):
+        """Upload vectors to Pinecone in batches, sending the batches concurrently"""
+        print("🚀 Uploading vectors to Pinecone...")
         
         try:
             uploaded_count = 0
             failed_count = 0
             
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                
+            def collect(batch_number, batch, async_result):
+                nonlocal uploaded_count, failed_count
                 try:
-                    self.index.upsert(vectors=batch)
+                    async_result.get()
                     uploaded_count += len(batch)
                     
-                    if (i // batch_size + 1) % 10 == 0:
-                        print(f"   Uploaded {uploaded_count:,}/{len(vectors):,} vectors...")
+                    if batch_number % 10 == 0:
+                        print(f"   Uploaded {uploaded_count:,} vectors...")
                         
                 except Exception as e:
-                    print(f"⚠️ Failed to upload batch {i//batch_size + 1}: {e}")
+                    print(f"⚠️ Failed to upload batch {batch_number}: {e}")
                     failed_count += len(batch)
             
+            # The index's thread pool keeps UPSERT_POOL_THREADS requests in flight;
+            # once MAX_PENDING_UPSERTS batches await a result, wait on the oldest
+            # before sending more, so the vectors stream instead of piling up
+            pending = deque()
+            for batch_number, batch in enumerate(chunks(vectors, batch_size), 1):
+                if len(pending) >= MAX_PENDING_UPSERTS:
+                    collect(*pending.popleft())
+                try:
+                    pending.append((batch_number, batch, self.index.upsert(vectors=batch, async_req=True)))
+                except Exception as e:
+                    print(f"⚠️ Failed to upload batch {batch_number}: {e}")
+                    failed_count += len(batch)
+            
+            while pending:
+                collect(*pending.popleft())
+            
             print(f"✅ Upload complete! {uploaded_count:,} vectors uploaded, {failed_count} failed")
             
             # Get final index stats
@@ -235,7 +397,8 @@ class GodzillaPineconeUploader:
     def upload_godzilla_dataset(self, 
                                csv_file: str = "godzilla_medical_dataset.csv",
                                index_name: str = "godzilla-medical",
-                               model_name: str = "all-MiniLM-L6-v2"):
+                               model_name: str = "all-MiniLM-L6-v2",
+                               model_backend: str = "torch"):
         """Complete pipeline to upload Godzilla dataset to Pinecone"""
         print("🦖" * 20)
         print("GODZILLA MEDICAL DATASET → PINECONE UPLOAD")
@@ -244,15 +407,16 @@ class GodzillaPineconeUploader:
         try:
             # Initialize components
             self.initialize_pinecone()
-            self.initialize_embedding_model(model_name)
+            self.initialize_embedding_model(model_name, backend=model_backend)
             self.create_or_get_index(index_name, dimension=384)  # all-MiniLM-L6-v2 has 384 dimensions
             
-            # Load and process data
+            # Load, embed and upload as one stream; every record becomes one vector
             records = self.load_godzilla_dataset(csv_file)
             vectors = self.prepare_vectors(records)
             
             # Upload to Pinecone
             uploaded, failed = self.upload_vectors(vectors)
+            total_records = uploaded + failed
             
             # Save upload report
             report = {
@@ -260,10 +424,10 @@ class GodzillaPineconeUploader:
                 'dataset_file': csv_file,
                 'index_name': index_name,
                 'embedding_model': model_name,
-                'total_records': len(records),
+                'total_records': total_records,
                 'vectors_uploaded': uploaded,
                 'vectors_failed': failed,
-                'success_rate': (uploaded / len(records)) * 100 if len(records) > 0 else 0
+                'success_rate': (uploaded / total_records) * 100 if total_records > 0 else 0
             }
             
             with open('pinecone_upload_report.json', 'w') as f:
@@ -273,7 +437,7 @@ class GodzillaPineconeUploader:
             print("GODZILLA DATASET UPLOAD COMPLETE!")
             print("🦖" * 20)
             print(f"📊 Upload Summary:")
-            print(f"   Total Records: {len(records):,}")
+            print(f"   Total Records: {total_records:,}")
             print(f"   Vectors Uploaded: {uploaded:,}")
             print(f"   Success Rate: {report['success_rate']:.1f}%")
             print(f"   Index Name: {index_name}")
@@ -297,6 +461,8 @@ def main():
     parser.add_argument("--index-name", default="godzilla-medical", help="Pinecone index name")
     parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence transformer model name")
     parser.add_argument("--environment", default="us-east-1-aws", help="Pinecone environment")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"],
+                        help="Embedding model backend; onnx/openvino are faster on CPU")
     
     args = parser.parse_args()
     
@@ -305,7 +471,8 @@ def main():
         uploader.upload_godzilla_dataset(
             csv_file=args.csv_file,
             index_name=args.index_name,
-            model_name=args.model
+            model_name=args.model,
+            model_backend=args.backend
         )
     except Exception as e:
         print(f"❌ Error: {e}")
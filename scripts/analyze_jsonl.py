@@ -6,7 +6,6 @@ Provides detailed statistics and insights about the JSONL medical dataset
 
 import json
 import pandas as pd
-from collections import Counter
 import numpy as np
 
 def analyze_jsonl_dataset(jsonl_file_path):
@@ -47,7 +46,7 @@ def analyze_jsonl_dataset(jsonl_file_path):
     print(f"   Min Confidence: {confidence_scores.min():.3f}")
     print(f"   Max Confidence: {confidence_scores.max():.3f}")
     
-    high_quality = len(df[df['confidence_score'] >= 0.8])
+    high_quality = int((confidence_scores.to_numpy() >= 0.8).sum())
     print(f"   High Quality (≥0.8): {high_quality:,} ({high_quality/len(records)*100:.1f}%)")
     
     print(f"\n📝 TEXT ANALYTICS")
@@ -60,9 +59,15 @@ def analyze_jsonl_dataset(jsonl_file_path):
     print(f"   Median Word Count: {word_counts.median():.0f} words")
     
     # Text length distribution
-    short_texts = len(df[df['text_length'] < 1000])
-    medium_texts = len(df[(df['text_length'] >= 1000) & (df['text_length'] < 3000)])
-    long_texts = len(df[df['text_length'] >= 3000])
+    length_buckets = pd.cut(
+        text_lengths,
+        bins=[-np.inf, 1000, 3000, np.inf],
+        labels=['short', 'medium', 'long'],
+        right=False
+    ).value_counts()
+    short_texts = length_buckets['short']
+    medium_texts = length_buckets['medium']
+    long_texts = length_buckets['long']
     
     print(f"   Short texts (<1K chars): {short_texts:,} ({short_texts/len(records)*100:.1f}%)")
     print(f"   Medium texts (1K-3K chars): {medium_texts:,} ({medium_texts/len(records)*100:.1f}%)")
@@ -87,15 +92,11 @@ def analyze_jsonl_dataset(jsonl_file_path):
         print(f"   {age_group}: {count:,} records ({percentage:.1f}%)")
     
     print(f"\n🔍 TOP KEYWORDS")
-    all_keywords = []
-    for keywords_list in df['keywords']:
-        if isinstance(keywords_list, list):
-            all_keywords.extend(keywords_list)
-    
-    keyword_counts = Counter(all_keywords)
+    keyword_lists = df['keywords'][df['keywords'].map(lambda k: isinstance(k, list))]
+    keyword_counts = keyword_lists.explode().dropna().value_counts()
     print(f"   Total Unique Keywords: {len(keyword_counts):,}")
     print(f"   Top 15 Keywords:")
-    for keyword, count in keyword_counts.most_common(15):
+    for keyword, count in keyword_counts.head(15).items():
         print(f"     '{keyword}': {count:,} occurrences")
     
     print(f"\n📖 SOURCE FILES (Top 10)")
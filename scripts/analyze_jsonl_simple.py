@@ -24,7 +24,8 @@ def analyze_jsonl_dataset(jsonl_file_path):
     confidence_scores = []
     text_lengths = []
     word_counts = []
-    all_keywords = []
+    keyword_counts = Counter()
+    keyword_occurrences = 0
     
     with open(jsonl_file_path, 'r', encoding='utf-8') as f:
         for line in f:
@@ -47,7 +48,8 @@ def analyze_jsonl_dataset(jsonl_file_path):
             # Keywords
             keywords = record.get('keywords', [])
             if isinstance(keywords, list):
-                all_keywords.extend(keywords)
+                keyword_counts.update(keywords)
+                keyword_occurrences += len(keywords)
     
     total_records = len(records)
     
@@ -102,9 +104,8 @@ def analyze_jsonl_dataset(jsonl_file_path):
         print(f"   {age_group}: {count:,} records ({percentage:.1f}%)")
     
     print(f"\n🔍 TOP KEYWORDS")
-    keyword_counts = Counter(all_keywords)
     print(f"   Total Unique Keywords: {len(keyword_counts):,}")
-    print(f"   Total Keyword Occurrences: {len(all_keywords):,}")
+    print(f"   Total Keyword Occurrences: {keyword_occurrences:,}")
     print(f"   Top 20 Keywords:")
     for keyword, count in keyword_counts.most_common(20):
         print(f"     '{keyword}': {count:,} occurrences")
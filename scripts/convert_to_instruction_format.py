@@ -4,82 +4,122 @@ Convert Godzilla Medical Dataset to Instruction-Tuning Format
 Transforms medical knowledge into instruction/input/output format for training platforms
 """
 
-import json
+import multiprocessing
+import numpy as np
+import orjson
+import os
 import random
-from typing import List, Dict
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
 
-def generate_medical_instructions(record: Dict) -> List[Dict]:
+# Flush serialized records to disk in ~1 MB batches
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Number of temporary bucket files used by the external shuffle
+SHUFFLE_BUCKETS = 64
+
+# Input lines handed to each worker process at a time
+POOL_CHUNKSIZE = 1024
+
+# Texts mentioning any of these get a diagnostic/treatment instruction
+CLINICAL_TERMS_PATTERN = re.compile(r'diagnosis|treatment|therapy|management', re.IGNORECASE)
+
+@dataclass(slots=True)
+class InstructionRecord:
+    """One instruction-tuning example; orjson serializes it like a dict"""
+    instruction: str
+    input: str
+    output: str
+
+def generate_medical_instructions(record: Dict) -> Iterator[InstructionRecord]:
     """
     Generate multiple instruction-tuning examples from a single medical record
     
     Args:
         record: Single medical record from Godzilla dataset
         
-    Returns:
-        List of instruction-tuning formatted records
+    Yields:
+        Instruction-tuning formatted records
     """
     
-    instructions = []
     text = record.get('text', '')
     specialty = record.get('medical_specialty', 'medicine')
     keywords = record.get('keywords', [])
     age_groups = record.get('age_groups', 'all_ages')
     
     if len(text) < 100:  # Skip very short texts
-        return instructions
+        return
+    
+    # Shared by every instruction below
+    output = text[:2000]  # Limit output length
+    specialty_formatted = specialty.replace('_', ' ').title()
+    
+    # (instruction, input) pairs; every pair shares the same output
+    pairs = []
     
     # Instruction type 1: General medical question about the content
     if keywords:
         main_keywords = keywords[:3]  # Use top 3 keywords
         keyword_text = ', '.join(main_keywords)
-        
-        instruction1 = {
-            "instruction": f"Provide medical information about {keyword_text} in {specialty}",
-            "input": f"What should medical professionals know about {keyword_text}?",
-            "output": text[:2000]  # Limit output length
-        }
-        instructions.append(instruction1)
+        pairs.append((
+            f"Provide medical information about {keyword_text} in {specialty}",
+            f"What should medical professionals know about {keyword_text}?"
+        ))
     
     # Instruction type 2: Age-specific question
     if age_groups != 'all_ages':
         age_specific = age_groups.replace('_', ' ').replace(',all_ages', '')
-        instruction2 = {
-            "instruction": f"Explain {specialty} considerations for {age_specific} patients",
-            "input": f"What are important {specialty} considerations when treating {age_specific} patients?",
-            "output": text[:2000]
-        }
-        instructions.append(instruction2)
+        pairs.append((
+            f"Explain {specialty} considerations for {age_specific} patients",
+            f"What are important {specialty} considerations when treating {age_specific} patients?"
+        ))
     
     # Instruction type 3: Specialty-specific question
-    specialty_formatted = specialty.replace('_', ' ').title()
-    instruction3 = {
-        "instruction": f"Provide {specialty_formatted} medical guidance",
-        "input": f"I need clinical information about {specialty_formatted}. Can you help?",
-        "output": text[:2000]
-    }
-    instructions.append(instruction3)
+    pairs.append((
+        f"Provide {specialty_formatted} medical guidance",
+        f"I need clinical information about {specialty_formatted}. Can you help?"
+    ))
     
     # Instruction type 4: Keyword-based clinical question
     if len(keywords) >= 2:
         clinical_keywords = [kw for kw in keywords[:5] if len(kw) > 3][:2]
         if len(clinical_keywords) >= 2:
-            instruction4 = {
-                "instruction": "Answer a clinical question based on medical evidence",
-                "input": f"What is the relationship between {clinical_keywords[0]} and {clinical_keywords[1]} in clinical practice?",
-                "output": text[:2000]
-            }
-            instructions.append(instruction4)
+            pairs.append((
+                "Answer a clinical question based on medical evidence",
+                f"What is the relationship between {clinical_keywords[0]} and {clinical_keywords[1]} in clinical practice?"
+            ))
     
     # Instruction type 5: Diagnostic/treatment guidance
-    if any(word in text.lower() for word in ['diagnosis', 'treatment', 'therapy', 'management']):
-        instruction5 = {
-            "instruction": "Provide diagnostic and treatment guidance",
-            "input": f"What are the key diagnostic and treatment considerations in {specialty}?",
-            "output": text[:2000]
-        }
-        instructions.append(instruction5)
-    
-    return instructions
+    if CLINICAL_TERMS_PATTERN.search(text):
+        pairs.append((
+            "Provide diagnostic and treatment guidance",
+            f"What are the key diagnostic and treatment considerations in {specialty}?"
+        ))
+    
+    for instruction, input_text in pairs:
+        yield InstructionRecord(instruction, input_text, output)
+
+def process_line(line: bytes) -> Optional[List[bytes]]:
+    """
+    Parse one input line and serialize its instruction records
+    
+    Runs in worker processes, so it returns ready-to-write JSONL lines.
+    
+    Args:
+        line: Raw JSONL line from the Godzilla dataset
+        
+    Returns:
+        Serialized instruction lines, or None if the line is not valid JSON
+    """
+    
+    try:
+        record = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+    
+    return [orjson.dumps(instruction) + b'\n' for instruction in generate_medical_instructions(record)]
 
 def convert_to_instruction_format(input_jsonl: str, output_jsonl: str, max_records: int = None):
     """
@@ -89,60 +129,97 @@ def convert_to_instruction_format(input_jsonl: str, output_jsonl: str, max_recor
         input_jsonl: Path to input JSONL file
         output_jsonl: Path to output instruction-format JSONL file
         max_records: Maximum number of records to process (None for all)
+        
+    Returns:
+        Number of instruction records written
     """
     
     print("🦖 Converting Godzilla Dataset to Instruction-Tuning Format")
     print("=" * 70)
     
-    instruction_records = []
     processed_count = 0
+    instruction_count = 0
     
-    with open(input_jsonl, 'r', encoding='utf-8') as f:
-        for line in f:
-            if max_records and processed_count >= max_records:
-                break
+    def iter_instruction_lines():
+        nonlocal processed_count, instruction_count
+        
+        # Parse and generate in worker processes; lines come back in input order
+        with open(input_jsonl, 'rb') as f, multiprocessing.Pool() as pool:
+            for lines in pool.imap(process_line, f, chunksize=POOL_CHUNKSIZE):
+                if max_records and processed_count >= max_records:
+                    break
                 
-            try:
-                record = json.loads(line.strip())
+                if lines is None:
+                    print(f"⚠️  Skipped invalid JSON line")
+                    continue
                 
-                # Generate instruction examples from this record
-                instructions = generate_medical_instructions(record)
-                instruction_records.extend(instructions)
+                instruction_count += len(lines)
+                yield from lines
                 
                 processed_count += 1
                 
                 if processed_count % 1000 == 0:
-                    print(f"✅ Processed {processed_count:,} records → {len(instruction_records):,} instructions")
-                    
-            except json.JSONDecodeError:
-                print(f"⚠️  Skipped invalid JSON line")
-                continue
-    
-    # Shuffle the instruction records for better training
-    random.shuffle(instruction_records)
+                    print(f"✅ Processed {processed_count:,} records → {instruction_count:,} instructions")
     
-    # Write instruction-format JSONL
-    print(f"\n💾 Writing {len(instruction_records):,} instruction records to {output_jsonl}")
-    
-    with open(output_jsonl, 'w', encoding='utf-8') as f:
-        for instruction in instruction_records:
-            f.write(json.dumps(instruction, ensure_ascii=False) + '\n')
+    # Shuffle the instruction records for better training while writing
+    print(f"\n💾 Writing shuffled instruction records to {output_jsonl}")
+    write_shuffled_jsonl(iter_instruction_lines(), output_jsonl)
     
     print("🎉 Conversion Complete!")
     print(f"📊 Statistics:")
     print(f"   Original records: {processed_count:,}")
-    print(f"   Instruction examples: {len(instruction_records):,}")
-    print(f"   Expansion ratio: {len(instruction_records)/processed_count:.1f}x")
+    print(f"   Instruction examples: {instruction_count:,}")
+    print(f"   Expansion ratio: {instruction_count/processed_count:.1f}x")
+    
+    return instruction_count
+
+def write_shuffled_jsonl(lines: Iterable[bytes], output_jsonl: str, num_buckets: int = SHUFFLE_BUCKETS):
+    """
+    Write JSONL lines in random order without holding them all in memory
+    
+    Lines are scattered across random temporary bucket files, then each
+    bucket is shuffled in memory and appended to the output file.
+    
+    Args:
+        lines: Serialized instruction records, each ending in a newline
+        output_jsonl: Path to output JSONL file
+        num_buckets: Number of temporary bucket files
+    """
+    
+    output_dir = os.path.dirname(os.path.abspath(output_jsonl))
     
-    return instruction_records
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        bucket_paths = [os.path.join(tmp_dir, f"bucket_{i}.jsonl") for i in range(num_buckets)]
+        
+        # Scatter lines across buckets; each bucket file buffers its own writes
+        bucket_files = [open(path, 'wb', buffering=WRITE_BUFFER_SIZE // num_buckets)
+                        for path in bucket_paths]
+        try:
+            for line in lines:
+                bucket_files[random.randrange(num_buckets)].write(line)
+        finally:
+            for bucket_file in bucket_files:
+                bucket_file.close()
+        
+        # Shuffle one bucket at a time into the output
+        rng = np.random.default_rng()
+        with open(output_jsonl, 'wb') as f:
+            for path in bucket_paths:
+                with open(path, 'rb') as bucket_file:
+                    bucket_lines = bucket_file.readlines()
+                order = rng.permutation(len(bucket_lines))
+                f.write(b''.join([bucket_lines[i] for i in order]))
 
-def create_sample_preview(instruction_records: List[Dict], num_samples: int = 3):
+def create_sample_preview(jsonl_file: str, num_samples: int = 3):
     """Show sample instruction records"""
     
     print(f"\n📋 Sample Instruction Records:")
     print("-" * 70)
     
-    for i, sample in enumerate(instruction_records[:num_samples], 1):
+    with open(jsonl_file, 'rb') as f:
+        samples = [orjson.loads(line) for _, line in zip(range(num_samples), f)]
+    
+    for i, sample in enumerate(samples, 1):
         print(f"\n--- Sample {i} ---")
         print(f"Instruction: {sample['instruction']}")
         print(f"Input: {sample['input']}")
@@ -154,21 +231,23 @@ def validate_instruction_format(jsonl_file: str, num_check: int = 100):
     print(f"\n🔍 Validating instruction format...")
     
     valid_count = 0
-    with open(jsonl_file, 'r', encoding='utf-8') as f:
+    with open(jsonl_file, 'rb') as f:
         for i, line in enumerate(f):
             if i >= num_check:
                 break
                 
             try:
-                record = json.loads(line.strip())
+                record = orjson.loads(line)
                 
-                # Check required fields
-                if all(key in record for key in ['instruction', 'input', 'output']):
-                    if all(isinstance(record[key], str) and len(record[key]) > 0 
-                          for key in ['instruction', 'input', 'output']):
-                        valid_count += 1
+                # Check required fields are non-empty strings
+                instruction = record.get('instruction')
+                input_text = record.get('input')
+                output = record.get('output')
+                if (instruction and input_text and output
+                        and type(instruction) is str and type(input_text) is str and type(output) is str):
+                    valid_count += 1
                 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 pass
     
     success_rate = (valid_count / min(num_check, i + 1)) * 100
@@ -182,14 +261,14 @@ if __name__ == "__main__":
     output_file = "/project/workspace/godzilla_instruction_dataset.jsonl"
     
     # Convert to instruction format
-    instruction_records = convert_to_instruction_format(input_file, output_file)
+    instruction_count = convert_to_instruction_format(input_file, output_file)
     
     # Show samples
-    create_sample_preview(instruction_records)
+    create_sample_preview(output_file)
     
     # Validate format
     validate_instruction_format(output_file)
     
     print(f"\n🦖 Your Godzilla instruction dataset is ready for training!")
     print(f"📁 File: godzilla_instruction_dataset.jsonl")
-    print(f"📊 Records: {len(instruction_records):,} instruction examples")
\ No newline at end of file
+    print(f"📊 Records: {instruction_count:,} instruction examples")
\ No newline at end of file
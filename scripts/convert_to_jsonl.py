@@ -5,23 +5,87 @@ Converts the comprehensive medical dataset from CSV format to JSONL for ML train
 """
 
 import csv
-import json
-import sys
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from pathlib import Path
 
-# Increase CSV field size limit for large medical text
-csv.field_size_limit(sys.maxsize)
+# Bytes parsed per Arrow CSV block (large medical text rows must fit in one)
+CSV_BLOCK_SIZE = 64 << 20
 
-def convert_csv_to_jsonl(csv_file_path, jsonl_file_path):
+# Flush serialized records to disk in ~1 MB batches
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Columns converted to numbers in the JSONL output
+INT_COLUMNS = frozenset({'chunk_token_count', 'word_count', 'page_number'})
+FLOAT_COLUMNS = frozenset({'confidence_score', 'clinical_relevance_score'})
+
+def split_keywords(keywords):
+    """
+    Split a comma-separated keywords column into lists of trimmed keywords
+    
+    Args:
+        keywords (pyarrow.StringArray): Raw keywords column
+    
+    Returns:
+        pyarrow.ListArray: One keyword list per row, empty for blank cells
+    """
+    
+    parts = pc.split_pattern(keywords, pattern=',')
+    keyword_lists = pa.ListArray.from_arrays(parts.offsets, pc.utf8_trim_whitespace(parts.flatten()))
+    
+    blank = pc.equal(pc.utf8_trim_whitespace(keywords), '')
+    return pc.if_else(blank, pa.scalar([], type=keyword_lists.type), keyword_lists)
+
+def parse_int(value):
+    """Convert a CSV cell to an integer, defaulting to 0"""
+    try:
+        return int(value) if value and value.strip() else 0
+    except ValueError:
+        return 0
+
+def parse_float(value):
+    """Convert a CSV cell to a float, defaulting to 0.0"""
+    try:
+        return float(value) if value and value.strip() else 0.0
+    except ValueError:
+        return 0.0
+
+def parse_str(value):
+    """Keep a CSV cell as a stripped string, handling empty values"""
+    return value.strip() if value else ""
+
+def parse_keywords(value):
+    """Keywords are already split into an array by split_keywords"""
+    return value
+
+def column_parser(name):
+    """Pick the cell converter for a column once, instead of per cell"""
+    if name in INT_COLUMNS:
+        return parse_int
+    if name in FLOAT_COLUMNS:
+        return parse_float
+    if name == 'keywords':
+        return parse_keywords
+    return parse_str
+
+def convert_csv_to_jsonl(csv_file_path, jsonl_file_path, sample_size=5):
     """
     Convert CSV file to JSONL format
     
     Args:
         csv_file_path (str): Path to input CSV file
         jsonl_file_path (str): Path to output JSONL file
+        sample_size (int): Number of leading records to keep as samples
+    
+    Returns:
+        tuple: (records written, sample records), or None if conversion failed
     """
     
     records_processed = 0
+    bytes_written = 0
+    sample_records = []
     
     print(f"🦖 Converting Godzilla Medical Dataset to JSONL format...")
     print(f"📁 Input:  {csv_file_path}")
@@ -29,43 +93,35 @@ def convert_csv_to_jsonl(csv_file_path, jsonl_file_path):
     print("-" * 80)
     
     try:
-        with open(csv_file_path, 'r', encoding='utf-8') as csv_file:
-            # Use DictReader to automatically handle headers
-            reader = csv.DictReader(csv_file)
+        with open(csv_file_path, 'r', encoding='utf-8', newline='') as csv_file:
+            fieldnames = next(csv.reader(csv_file))
+        
+        # Parse with Arrow's multi-threaded CSV reader, keeping every column as
+        # text so the conversions below behave exactly as before
+        reader = pacsv.open_csv(
+            csv_file_path,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                column_types={name: pa.string() for name in fieldnames},
+                strings_can_be_null=False
+            )
+        )
+        
+        with open(jsonl_file_path, 'wb') as jsonl_file:
+            buf = bytearray()
+            names = reader.schema.names
+            parsers = [column_parser(name) for name in names]
             
-            with open(jsonl_file_path, 'w', encoding='utf-8') as jsonl_file:
-                for row in reader:
+            for batch in reader:
+                columns = {name: batch.column(name) for name in batch.schema.names}
+                if 'keywords' in columns:
+                    columns['keywords'] = split_keywords(columns['keywords'])
+                columns = [column.to_pylist() for column in columns.values()]
+                
+                for values in zip(*columns):
                     # Convert CSV row to JSON object
-                    json_record = {}
-                    
-                    for key, value in row.items():
-                        # Handle different data types appropriately
-                        if key in ['chunk_token_count', 'word_count', 'page_number']:
-                            # Convert to integer if possible
-                            try:
-                                json_record[key] = int(value) if value and value.strip() else 0
-                            except ValueError:
-                                json_record[key] = 0
-                                
-                        elif key in ['confidence_score', 'clinical_relevance_score']:
-                            # Convert to float if possible  
-                            try:
-                                json_record[key] = float(value) if value and value.strip() else 0.0
-                            except ValueError:
-                                json_record[key] = 0.0
-                                
-                        elif key == 'keywords':
-                            # Convert keywords to array
-                            if value and value.strip():
-                                # Split by comma and clean up
-                                keywords_list = [kw.strip() for kw in value.split(',')]
-                                json_record[key] = keywords_list
-                            else:
-                                json_record[key] = []
-                                
-                        else:
-                            # Keep as string, handle empty values
-                            json_record[key] = value.strip() if value else ""
+                    json_record = {name: parse(value) for name, parse, value in zip(names, parsers, values)}
                     
                     # Add metadata for ML training
                     json_record['dataset_version'] = '1.0'
@@ -80,20 +136,30 @@ def convert_csv_to_jsonl(csv_file_path, jsonl_file_path):
                     specialty = json_record.get('medical_specialty', '').lower()
                     json_record['training_category'] = specialty if specialty else 'general_medicine'
                     
-                    # Write JSON object as single line
-                    jsonl_file.write(json.dumps(json_record, ensure_ascii=False) + '\n')
+                    # Buffer JSON object as single line
+                    buf += orjson.dumps(json_record)
+                    buf += b'\n'
+                    if len(buf) >= WRITE_BUFFER_SIZE:
+                        bytes_written += jsonl_file.write(buf)
+                        buf.clear()
                     records_processed += 1
                     
+                    if len(sample_records) < sample_size:
+                        sample_records.append(json_record)
+                    
                     # Progress indicator
                     if records_processed % 1000 == 0:
                         print(f"✅ Processed {records_processed:,} records...")
+            
+            if buf:
+                bytes_written += jsonl_file.write(buf)
     
     except FileNotFoundError:
         print(f"❌ Error: Could not find input file {csv_file_path}")
-        return False
+        return None
     except Exception as e:
         print(f"❌ Error during conversion: {str(e)}")
-        return False
+        return None
     
     print("-" * 80)
     print(f"🎉 Conversion completed successfully!")
@@ -103,7 +169,7 @@ def convert_csv_to_jsonl(csv_file_path, jsonl_file_path):
     # Calculate file sizes
     try:
         csv_size = Path(csv_file_path).stat().st_size / (1024 * 1024)  # MB
-        jsonl_size = Path(jsonl_file_path).stat().st_size / (1024 * 1024)  # MB
+        jsonl_size = bytes_written / (1024 * 1024)  # MB
         
         print(f"📈 File sizes:")
         print(f"   CSV:  {csv_size:.2f} MB")
@@ -113,62 +179,40 @@ def convert_csv_to_jsonl(csv_file_path, jsonl_file_path):
     except Exception as e:
         print(f"⚠️  Could not calculate file sizes: {e}")
     
-    return True
+    return records_processed, sample_records
 
-def validate_jsonl_file(jsonl_file_path, sample_size=5):
+def validate_jsonl_file(jsonl_file_path, records_written, sample_records):
     """
-    Validate the JSONL file and show samples
+    Report on the JSONL file and show samples
+    
+    Every line was produced by orjson.dumps during conversion, so the file is
+    valid by construction and is not read back here.
     
     Args:
-        jsonl_file_path (str): Path to JSONL file to validate
-        sample_size (int): Number of sample records to display
+        jsonl_file_path (str): Path to the written JSONL file
+        records_written (int): Number of records written by the converter
+        sample_records (list): Leading records collected during conversion
     """
     
     print(f"\n🔍 Validating JSONL file: {jsonl_file_path}")
     print("-" * 80)
     
-    try:
-        valid_records = 0
-        sample_records = []
-        
-        with open(jsonl_file_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                try:
-                    # Try to parse each line as JSON
-                    record = json.loads(line.strip())
-                    valid_records += 1
-                    
-                    # Collect samples
-                    if len(sample_records) < sample_size:
-                        sample_records.append(record)
-                        
-                except json.JSONDecodeError as e:
-                    print(f"❌ Invalid JSON on line {line_num}: {e}")
-                    return False
-        
-        print(f"✅ Validation successful!")
-        print(f"📊 Valid JSON records: {valid_records:,}")
-        
-        # Show sample records
-        print(f"\n📋 Sample records (first {len(sample_records)}):")
-        for i, record in enumerate(sample_records, 1):
-            print(f"\n--- Sample Record {i} ---")
-            print(f"ID: {record.get('id', 'N/A')}")
-            print(f"Source: {record.get('source_dataset', 'N/A')}")
-            print(f"Specialty: {record.get('medical_specialty', 'N/A')}")
-            print(f"Keywords: {record.get('keywords', [])[:3]}..." if len(record.get('keywords', [])) > 3 else f"Keywords: {record.get('keywords', [])}")
-            print(f"Text preview: {record.get('text', '')[:100]}...")
-            print(f"Confidence: {record.get('confidence_score', 0)}")
-            print(f"Text length: {record.get('text_length', 0)} chars")
-            
-        return True
+    print(f"✅ Validation successful!")
+    print(f"📊 Valid JSON records: {records_written:,}")
+    
+    # Show sample records
+    print(f"\n📋 Sample records (first {len(sample_records)}):")
+    for i, record in enumerate(sample_records, 1):
+        print(f"\n--- Sample Record {i} ---")
+        print(f"ID: {record.get('id', 'N/A')}")
+        print(f"Source: {record.get('source_dataset', 'N/A')}")
+        print(f"Specialty: {record.get('medical_specialty', 'N/A')}")
+        print(f"Keywords: {record.get('keywords', [])[:3]}..." if len(record.get('keywords', [])) > 3 else f"Keywords: {record.get('keywords', [])}")
+        print(f"Text preview: {record.get('text', '')[:100]}...")
+        print(f"Confidence: {record.get('confidence_score', 0)}")
+        print(f"Text length: {record.get('text_length', 0)} chars")
         
-    except FileNotFoundError:
-        print(f"❌ Error: Could not find JSONL file {jsonl_file_path}")
-        return False
-    except Exception as e:
-        print(f"❌ Error during validation: {str(e)}")
-        return False
+    return True
 
 if __name__ == "__main__":
     # File paths
@@ -176,10 +220,11 @@ if __name__ == "__main__":
     jsonl_output = "/project/workspace/godzilla_medical_dataset.jsonl"
     
     # Convert CSV to JSONL
-    success = convert_csv_to_jsonl(csv_input, jsonl_output)
+    result = convert_csv_to_jsonl(csv_input, jsonl_output, sample_size=3)
     
-    if success:
-        # Validate the output
-        validate_jsonl_file(jsonl_output, sample_size=3)
+    if result:
+        # Report on the output
+        records_written, sample_records = result
+        validate_jsonl_file(jsonl_output, records_written, sample_records)
     
     print("\n🦖 Godzilla JSONL conversion complete!")
\ No newline at end of file
@@ -4,94 +4,106 @@ Advanced Nelson Textbook Instruction Dataset Creator
 Smart chunking for large continuous medical text files
 """
 
-import json
+import mmap
+import numpy as np
+import orjson
 import re
 import random
 import os
+import tempfile
+from itertools import islice
+from dataclasses import dataclass
 
-def advanced_text_chunker(text, target_chunk_size=1200):
+# Flush serialized records to disk in ~1 MB batches
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Number of temporary bucket files used by the external shuffle
+SHUFFLE_BUCKETS = 64
+
+# Chapter/part headings that mark natural section breaks
+CHAPTER_BREAK_PATTERN = re.compile(rb'(?i)(?:chapter\s+\d+|part\s+[ivx]+)')
+
+# Common medical topic patterns, each scanned on its own so overlapping
+# topics ("acute kidney infection", "kidney infection") are all found
+MEDICAL_TOPIC_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'\b[A-Z][a-z]+ (?:syndrome|disease|disorder|condition)\b',
+    r'\b(?:acute|chronic) [a-z]+ [a-z]+\b',
+    r'\b[a-z]+ (?:infection|inflammation|injury)\b'
+))
+
+# Chunks mentioning any of these get a clinical guidance instruction
+CLINICAL_TERMS_PATTERN = re.compile(r'patient|treatment|diagnosis|therapy', re.IGNORECASE)
+
+def advanced_text_chunker(data, target_chunk_size=1200):
     """
     Advanced text chunking that handles continuous medical text
+    
+    data is the UTF-8 encoded text (bytes or mmap); chapter breaks are found
+    on the raw bytes and only the sections that are kept get decoded.
     """
     
     chunks = []
     
     # First, try to find natural break points
     # Look for chapter/section indicators
-    chapter_splits = re.split(r'(?i)(?:chapter\s+\d+|part\s+[ivx]+)', text)
+    breaks = [match.span() for match in CHAPTER_BREAK_PATTERN.finditer(data)]
     
-    if len(chapter_splits) > 5:  # If we found good chapter breaks
-        print(f"   Found {len(chapter_splits)} chapter sections")
+    if len(breaks) + 1 > 5:  # If we found good chapter breaks
+        print(f"   Found {len(breaks) + 1} chapter sections")
+        
+        section_starts = [0] + [end for _, end in breaks]
+        section_ends = [start for start, _ in breaks] + [len(data)]
         
-        for section in chapter_splits:
-            if len(section.strip()) > 200:  # Only process substantial sections
-                section_chunks = split_by_size(section.strip(), target_chunk_size)
+        for start, end in zip(section_starts, section_ends):
+            section = data[start:end].decode('utf-8').strip()
+            if len(section) > 200:  # Only process substantial sections
+                section_chunks = split_by_size(section, target_chunk_size)
                 chunks.extend(section_chunks)
     else:
         # Fallback: split by size with smart boundaries
-        chunks = split_by_size(text, target_chunk_size)
+        chunks = split_by_size(data[:].decode('utf-8'), target_chunk_size)
     
     return chunks
 
 def split_by_size(text, target_size=1200):
     """Split text into chunks of approximately target_size"""
     
-    chunks = []
-    words = text.split()
-    
-    current_chunk_words = []
-    current_length = 0
+    # Greedily pack whole words into chunks of at most target_size - 1
+    # characters; a single word longer than that becomes its own chunk
+    chunk_pattern = re.compile(r'\S.{0,%d}(?= |\Z)|\S+' % max(target_size - 2, 0))
+    normalized = ' '.join(text.split())
     
-    for word in words:
-        word_length = len(word) + 1  # +1 for space
-        
-        if current_length + word_length > target_size and current_chunk_words:
-            # Save current chunk
-            chunk_text = ' '.join(current_chunk_words)
-            if len(chunk_text) > 100:  # Only save substantial chunks
-                chunks.append(chunk_text)
-            
-            # Start new chunk
-            current_chunk_words = [word]
-            current_length = word_length
-        else:
-            current_chunk_words.append(word)
-            current_length += word_length
-    
-    # Add final chunk
-    if current_chunk_words:
-        final_chunk = ' '.join(current_chunk_words)
-        if len(final_chunk) > 100:
-            chunks.append(final_chunk)
-    
-    return chunks
+    return [chunk for chunk in chunk_pattern.findall(normalized) if len(chunk) > 100]
 
 def extract_medical_topics(text):
     """Extract likely medical topics from text"""
     
-    # Common medical patterns
-    patterns = [
-        r'\b[A-Z][a-z]+ (?:syndrome|disease|disorder|condition)\b',
-        r'\b(?:acute|chronic) [a-z]+ [a-z]+\b',
-        r'\b[a-z]+ (?:infection|inflammation|injury)\b'
-    ]
+    matches = []
+    for pattern in MEDICAL_TOPIC_PATTERNS:
+        matches.extend(islice(pattern.finditer(text), 3))  # Limit to prevent too many
     
-    topics = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        topics.extend(matches[:3])  # Limit to prevent too many
-    
-    return list(set(topics))[:5]  # Remove duplicates, limit to 5
+    # Order by position in the text so the result does not vary between runs
+    matches.sort(key=lambda match: match.start())
+    topics = list(dict.fromkeys(match.group() for match in matches))
+    return topics[:5]  # Remove duplicates, limit to 5
+
+@dataclass(slots=True)
+class InstructionRecord:
+    """One instruction-tuning example; orjson serializes it like a dict"""
+    instruction: str
+    input: str
+    output: str
+    chunk_id: str
+    source: str
+    content_type: str
 
 def create_diverse_instructions(chunk, part_name, chunk_index):
     """Create diverse instruction formats from a medical text chunk"""
     
-    instructions = []
-    
     # Clean the chunk
     clean_chunk = chunk.strip()
     if len(clean_chunk) < 100:
-        return instructions
+        return []
     
     # Limit output length for training efficiency
     output_text = clean_chunk[:800] if len(clean_chunk) > 800 else clean_chunk
@@ -99,103 +111,130 @@ def create_diverse_instructions(chunk, part_name, chunk_index):
     # Extract topics for more specific instructions
     topics = extract_medical_topics(clean_chunk)
     
+    # (instruction, input) pairs; every pair shares the same output
+    pairs = []
+    
     # Instruction 1: General medical knowledge
-    inst1 = {
-        "instruction": "Provide pediatric medical information",
-        "input": "Share relevant medical knowledge from pediatric practice",
-        "output": output_text
-    }
-    instructions.append(inst1)
+    pairs.append((
+        "Provide pediatric medical information",
+        "Share relevant medical knowledge from pediatric practice"
+    ))
     
     # Instruction 2: Educational content
-    inst2 = {
-        "instruction": "Explain medical concepts for healthcare professionals",
-        "input": "What are important concepts in pediatric medicine?",
-        "output": output_text
-    }
-    instructions.append(inst2)
+    pairs.append((
+        "Explain medical concepts for healthcare professionals",
+        "What are important concepts in pediatric medicine?"
+    ))
     
     # Instruction 3: Topic-specific (if topics found)
     if topics:
         topic = topics[0]
-        inst3 = {
-            "instruction": "Answer a specific medical question",
-            "input": f"What should I know about {topic.lower()}?",
-            "output": output_text
-        }
-        instructions.append(inst3)
+        pairs.append((
+            "Answer a specific medical question",
+            f"What should I know about {topic.lower()}?"
+        ))
     
     # Instruction 4: Clinical guidance
-    if any(word in clean_chunk.lower() for word in ['patient', 'treatment', 'diagnosis', 'therapy']):
-        inst4 = {
-            "instruction": "Provide clinical guidance based on medical literature",
-            "input": "I need clinical guidance for patient care",
-            "output": output_text
-        }
-        instructions.append(inst4)
+    if CLINICAL_TERMS_PATTERN.search(clean_chunk):
+        pairs.append((
+            "Provide clinical guidance based on medical literature",
+            "I need clinical guidance for patient care"
+        ))
     
     # Add metadata
-    for inst in instructions:
-        inst['chunk_id'] = f"{part_name}_chunk_{chunk_index}"
-        inst['source'] = "Nelson Textbook of Pediatrics 22nd Edition"
-        inst['content_type'] = "medical_textbook"
+    chunk_id = f"{part_name}_chunk_{chunk_index}"
+    return [
+        InstructionRecord(instruction, input_text, output_text, chunk_id,
+                          "Nelson Textbook of Pediatrics 22nd Edition", "medical_textbook")
+        for instruction, input_text in pairs
+    ]
+
+def write_shuffled_jsonl(records, output_file, num_buckets=SHUFFLE_BUCKETS):
+    """
+    Write records to JSONL in random order without holding them all in memory
+    
+    Records are scattered across random temporary bucket files, then each
+    bucket is shuffled in memory and appended to the output file.
+    """
     
-    return instructions
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        bucket_paths = [os.path.join(tmp_dir, f"bucket_{i}.jsonl") for i in range(num_buckets)]
+        
+        # Scatter records across buckets; each bucket file buffers its own writes
+        bucket_files = [open(path, 'wb', buffering=WRITE_BUFFER_SIZE // num_buckets)
+                        for path in bucket_paths]
+        try:
+            for record in records:
+                bucket_files[random.randrange(num_buckets)].write(orjson.dumps(record) + b'\n')
+        finally:
+            for bucket_file in bucket_files:
+                bucket_file.close()
+        
+        # Shuffle one bucket at a time into the output
+        rng = np.random.default_rng()
+        with open(output_file, 'wb') as f:
+            for path in bucket_paths:
+                with open(path, 'rb') as bucket_file:
+                    bucket_lines = bucket_file.readlines()
+                order = rng.permutation(len(bucket_lines))
+                f.write(b''.join([bucket_lines[i] for i in order]))
 
 def main():
     print("🦖 ADVANCED NELSON INSTRUCTION DATASET CREATOR")
     print("=" * 70)
     
-    all_instructions = []
     total_text_processed = 0
+    instruction_count = 0
+    total_output_length = 0
     
-    # Process all three parts
-    for part_num in [1, 2, 3]:
-        file_path = f"/project/workspace/nelson_textbook_of_pediatrics_part_{part_num}_cleaned.txt"
+    def iter_instructions():
+        nonlocal total_text_processed, instruction_count, total_output_length
         
-        print(f"\n📚 Processing Nelson Part {part_num}...")
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            print(f"   📏 File size: {len(content):,} characters")
-            total_text_processed += len(content)
-            
-            # Advanced chunking
-            chunks = advanced_text_chunker(content, target_chunk_size=1500)
-            print(f"   ✂️  Generated: {len(chunks)} chunks")
-            
-            # Create instructions from chunks
-            part_instructions = []
-            for i, chunk in enumerate(chunks):
-                chunk_instructions = create_diverse_instructions(chunk, f"nelson_part_{part_num}", i)
-                part_instructions.extend(chunk_instructions)
+        # Process all three parts
+        for part_num in [1, 2, 3]:
+            file_path = f"/project/workspace/nelson_textbook_of_pediatrics_part_{part_num}_cleaned.txt"
             
-            print(f"   🎯 Created: {len(part_instructions):,} instruction examples")
-            all_instructions.extend(part_instructions)
+            print(f"\n📚 Processing Nelson Part {part_num}...")
             
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-    
-    print(f"\n🔀 Shuffling {len(all_instructions):,} examples for optimal training...")
-    random.shuffle(all_instructions)
-    
-    # Write the complete dataset
+            try:
+                # Map the file instead of reading it into one large string
+                with open(file_path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                    print(f"   📏 File size: {len(content):,} bytes")
+                    total_text_processed += len(content)
+                    
+                    # Advanced chunking
+                    chunks = advanced_text_chunker(content, target_chunk_size=1500)
+                print(f"   ✂️  Generated: {len(chunks)} chunks")
+                
+                # Create instructions from chunks
+                part_count = 0
+                for i, chunk in enumerate(chunks):
+                    for instruction in create_diverse_instructions(chunk, f"nelson_part_{part_num}", i):
+                        part_count += 1
+                        total_output_length += len(instruction.output)
+                        yield instruction
+                
+                print(f"   🎯 Created: {part_count:,} instruction examples")
+                instruction_count += part_count
+                
+            except Exception as e:
+                print(f"   ❌ Error: {e}")
+    
+    # Write the complete dataset, shuffled for optimal training
     output_file = "/project/workspace/nelson_complete_training_dataset.jsonl"
     
-    print(f"💾 Writing complete dataset to {output_file}")
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for instruction in all_instructions:
-            f.write(json.dumps(instruction, ensure_ascii=False) + '\n')
+    print(f"🔀 Writing shuffled dataset to {output_file}")
+    write_shuffled_jsonl(iter_instructions(), output_file)
     
     # Final statistics
     print(f"\n🎉 COMPREHENSIVE DATASET CREATED!")
     print(f"📊 Final Statistics:")
-    print(f"   📖 Source text processed: {total_text_processed:,} characters ({total_text_processed/(1024*1024):.1f} MB)")
-    print(f"   🎯 Training examples created: {len(all_instructions):,}")
-    print(f"   📏 Average output length: {sum(len(inst['output']) for inst in all_instructions)//len(all_instructions):.0f} characters")
+    print(f"   📖 Source text processed: {total_text_processed:,} bytes ({total_text_processed/(1024*1024):.1f} MB)")
+    print(f"   🎯 Training examples created: {instruction_count:,}")
+    print(f"   📏 Average output length: {total_output_length//instruction_count:.0f} characters")
     
     print(f"   💾 Output file size: {os.path.getsize(output_file) / (1024 * 1024):.1f} MB")
     
@@ -203,7 +242,10 @@ def main():
     print(f"\n📋 Sample Instruction Records:")
     print("-" * 60)
     
-    for i, sample in enumerate(all_instructions[:3], 1):
+    with open(output_file, 'rb') as f:
+        samples = [orjson.loads(line) for _, line in zip(range(3), f)]
+    
+    for i, sample in enumerate(samples, 1):
         print(f"\n--- Training Example {i} ---")
         print(f"📝 Instruction: {sample['instruction']}")
         print(f"❓ Input: {sample['input']}")
@@ -212,7 +254,7 @@ def main():
     
     print(f"\n🚀 READY FOR TRAINING PLATFORM!")
     print(f"📤 Upload: nelson_complete_training_dataset.jsonl")
-    print(f"🎓 {len(all_instructions):,} medical instruction examples ready!")
+    print(f"🎓 {instruction_count:,} medical instruction examples ready!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
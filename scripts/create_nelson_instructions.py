@@ -4,11 +4,41 @@ Nelson Textbook to Instruction Dataset Creator
 Converts clean Nelson textbook files into high-quality instruction-tuning format
 """
 
-import json
-import re
+import multiprocessing
+import numpy as np
+import orjson
+import os
 import random
+import re
+import tempfile
+from functools import partial
 from pathlib import Path
 
+# Flush serialized records to disk in ~1 MB batches
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Number of temporary bucket files used by the external shuffle
+SHUFFLE_BUCKETS = 64
+
+# Text chunks handed to each worker process at a time
+POOL_CHUNKSIZE = 64
+
+# One JSONL line per instruction; filled in with pre-encoded JSON values
+INSTRUCTION_LINE_TEMPLATE = (
+    b'{"instruction":%s,"input":%s,"output":%s,"source_part":%s,'
+    b'"text_length":%d,"medical_source":%s}\n'
+)
+
+# Sentence boundary: period/!/? followed by whitespace and a capital letter
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+# Key medical terms (first group) and any other diagnosis/treatment/management
+# mention (second group), found in one scan of the lowercased text
+MEDICAL_TERMS_PATTERN = re.compile(
+    r'\b((?:diagnosis|treatment|therapy|symptom|patient|disease|condition|syndrome|infection|medication|dosage)\w*)\b'
+    r'|(diagnosis|treatment|management)'
+)
+
 def smart_text_chunker(text, chunk_size=800, overlap=100):
     """
     Intelligently chunk text at sentence boundaries
@@ -22,9 +52,11 @@ def smart_text_chunker(text, chunk_size=800, overlap=100):
     chunks = []
     
     # Split into sentences (look for period followed by space and capital letter)
-    sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', text)
+    sentences = SENTENCE_SPLIT_PATTERN.split(text)
     
-    current_chunk = ""
+    # Sentences of the chunk being built; joined only when the chunk is saved
+    buf = []
+    buf_len = 0
     
     for sentence in sentences:
         sentence = sentence.strip()
@@ -32,84 +64,120 @@ def smart_text_chunker(text, chunk_size=800, overlap=100):
             continue
             
         # Check if adding this sentence would exceed chunk size
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
+        if buf and buf_len + len(sentence) > chunk_size:
             # Save current chunk
+            current_chunk = ' '.join(buf)
             chunks.append(current_chunk.strip())
             
             # Start new chunk with overlap from end of current chunk
-            if overlap > 0 and len(current_chunk) > overlap:
-                current_chunk = current_chunk[-overlap:] + " " + sentence
-            else:
-                current_chunk = sentence
-        else:
-            # Add sentence to current chunk
-            if current_chunk:
-                current_chunk += " " + sentence
+            if overlap > 0 and buf_len > overlap:
+                buf = [current_chunk[-overlap:]]
+                buf_len = overlap
             else:
-                current_chunk = sentence
+                buf = []
+                buf_len = 0
+        
+        # Add sentence to current chunk
+        buf_len += len(sentence) + 1 if buf else len(sentence)
+        buf.append(sentence)
     
     # Don't forget the last chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    last_chunk = ' '.join(buf).strip()
+    if last_chunk:
+        chunks.append(last_chunk)
     
     return chunks
 
 def generate_medical_instruction_examples(text_chunk, part_number):
     """Generate diverse instruction-tuning examples from medical text"""
     
-    instructions = []
-    
     if len(text_chunk) < 100:
-        return instructions
+        return []
     
-    # Extract key medical terms
-    medical_terms = re.findall(r'\b(?:diagnosis|treatment|therapy|symptom|patient|disease|condition|syndrome|infection|medication|dosage)\w*\b', text_chunk.lower())
+    # Extract key medical terms and education-worthy mentions in one pass
+    matches = MEDICAL_TERMS_PATTERN.findall(text_chunk.lower())
+    medical_terms = [term for term, _ in matches if term]
+    has_education_terms = any(
+        mention or 'diagnosis' in term or 'treatment' in term or 'management' in term
+        for term, mention in matches
+    )
     
     # Clean output text
     clean_output = text_chunk[:600] if len(text_chunk) > 600 else text_chunk
     
+    # (instruction, input) pairs; every pair shares the same output
+    pairs = []
+    
     # Instruction type 1: General medical knowledge
-    inst1 = {
-        "instruction": "Provide medical knowledge from pediatric textbook",
-        "input": "Share important pediatric medical information",
-        "output": clean_output
-    }
-    instructions.append(inst1)
+    pairs.append((
+        "Provide medical knowledge from pediatric textbook",
+        "Share important pediatric medical information"
+    ))
     
     # Instruction type 2: Clinical guidance
-    inst2 = {
-        "instruction": "Answer a pediatric medical question",
-        "input": "What should a pediatrician know about clinical practice?",
-        "output": clean_output
-    }
-    instructions.append(inst2)
+    pairs.append((
+        "Answer a pediatric medical question",
+        "What should a pediatrician know about clinical practice?"
+    ))
     
     # Instruction type 3: Medical education
-    if any(term in text_chunk.lower() for term in ['diagnosis', 'treatment', 'management']):
-        inst3 = {
-            "instruction": "Explain medical concepts for healthcare education",
-            "input": "Explain key medical concepts from pediatric medicine",
-            "output": clean_output
-        }
-        instructions.append(inst3)
+    if has_education_terms:
+        pairs.append((
+            "Explain medical concepts for healthcare education",
+            "Explain key medical concepts from pediatric medicine"
+        ))
     
     # Instruction type 4: Specific medical topic (if keywords found)
     if medical_terms:
-        main_term = medical_terms[0] if medical_terms else "medical condition"
-        inst4 = {
-            "instruction": "Provide detailed medical information",
-            "input": f"Tell me about {main_term} in pediatric medicine",
-            "output": clean_output
-        }
-        instructions.append(inst4)
+        main_term = medical_terms[0]
+        pairs.append((
+            "Provide detailed medical information",
+            f"Tell me about {main_term} in pediatric medicine"
+        ))
     
     # Add part metadata
-    for inst in instructions:
-        inst['source_part'] = f"nelson_part_{part_number}"
-        inst['text_length'] = len(clean_output)
-        inst['medical_source'] = "Nelson Textbook of Pediatrics 22nd Edition"
+    source_part = f"nelson_part_{part_number}"
+    text_length = len(clean_output)
+    return [
+        {
+            "instruction": instruction,
+            "input": input_text,
+            "output": clean_output,
+            "source_part": source_part,
+            "text_length": text_length,
+            "medical_source": "Nelson Textbook of Pediatrics 22nd Edition"
+        }
+        for instruction, input_text in pairs
+    ]
+
+def process_chunk(text_chunk, part_number):
+    """
+    Generate and serialize the instructions for one chunk
+    
+    Runs in worker processes. The instructions of a chunk share one output
+    string, so it is JSON-encoded once and spliced into every line.
     
-    return instructions
+    Returns:
+        (JSONL lines, total output characters across those lines)
+    """
+    
+    instructions = generate_medical_instruction_examples(text_chunk, part_number)
+    if not instructions:
+        return [], 0
+    
+    first = instructions[0]
+    output_json = orjson.dumps(first['output'])
+    source_part_json = orjson.dumps(first['source_part'])
+    medical_source_json = orjson.dumps(first['medical_source'])
+    
+    lines = [
+        INSTRUCTION_LINE_TEMPLATE % (
+            orjson.dumps(inst['instruction']), orjson.dumps(inst['input']), output_json,
+            source_part_json, inst['text_length'], medical_source_json
+        )
+        for inst in instructions
+    ]
+    return lines, len(first['output']) * len(lines)
 
 def process_nelson_files():
     """Process all three Nelson textbook parts"""
@@ -117,52 +185,54 @@ def process_nelson_files():
     print("🦖 CREATING COMPREHENSIVE NELSON INSTRUCTION DATASET")
     print("=" * 80)
     
-    all_instructions = []
+    total_examples = 0
+    total_output_length = 0
     
-    # Process each part
-    for part_num in [1, 2, 3]:
-        file_path = f"/project/workspace/nelson_textbook_of_pediatrics_part_{part_num}_cleaned.txt"
-        
-        print(f"\n📖 Processing Part {part_num}...")
+    def iter_instruction_lines():
+        nonlocal total_examples, total_output_length
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            print(f"   File size: {len(content):,} characters")
-            
-            # Chunk the text intelligently
-            chunks = smart_text_chunker(content, chunk_size=1000, overlap=150)
-            print(f"   Generated chunks: {len(chunks):,}")
-            
-            # Generate instructions from each chunk
-            part_instructions = []
-            for chunk in chunks:
-                chunk_instructions = generate_medical_instruction_examples(chunk, part_num)
-                part_instructions.extend(chunk_instructions)
-            
-            print(f"   Created instructions: {len(part_instructions):,}")
-            all_instructions.extend(part_instructions)
-            
-        except FileNotFoundError:
-            print(f"   ⚠️  File not found: {file_path}")
-        except Exception as e:
-            print(f"   ❌ Error processing part {part_num}: {e}")
-    
-    # Shuffle for better training distribution
-    random.shuffle(all_instructions)
+        # Process each part, sharing one worker pool across them; encoded lines
+        # stream straight on to the shuffle buckets while workers keep generating
+        with multiprocessing.Pool() as pool:
+            for part_num in [1, 2, 3]:
+                file_path = f"/project/workspace/nelson_textbook_of_pediatrics_part_{part_num}_cleaned.txt"
+                
+                print(f"\n📖 Processing Part {part_num}...")
+                
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                    
+                    print(f"   File size: {len(content):,} characters")
+                    
+                    # Chunk the text intelligently
+                    chunks = smart_text_chunker(content, chunk_size=1000, overlap=150)
+                    print(f"   Generated chunks: {len(chunks):,}")
+                    
+                    # Generate and serialize instructions from each chunk in worker processes
+                    generate = partial(process_chunk, part_number=part_num)
+                    part_count = 0
+                    for lines, output_length in pool.imap(generate, chunks, chunksize=POOL_CHUNKSIZE):
+                        part_count += len(lines)
+                        total_output_length += output_length
+                        yield from lines
+                    
+                    print(f"   Created instructions: {part_count:,}")
+                    total_examples += part_count
+                
+                except FileNotFoundError:
+                    print(f"   ⚠️  File not found: {file_path}")
+                except Exception as e:
+                    print(f"   ❌ Error processing part {part_num}: {e}")
     
-    # Write final dataset
+    # Write final dataset, shuffled for better training distribution
     output_file = "/project/workspace/nelson_complete_instruction_dataset.jsonl"
     
     print(f"\n💾 Writing final dataset...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for instruction in all_instructions:
-            f.write(json.dumps(instruction, ensure_ascii=False) + '\n')
+    write_shuffled_jsonl(iter_instruction_lines(), output_file)
     
     # Calculate statistics
-    total_examples = len(all_instructions)
-    avg_output_length = sum(len(inst['output']) for inst in all_instructions) / total_examples if total_examples > 0 else 0
+    avg_output_length = total_output_length / total_examples if total_examples > 0 else 0
     
     print(f"\n🎉 DATASET CREATION COMPLETE!")
     print(f"📊 Final Statistics:")
@@ -174,7 +244,10 @@ def process_nelson_files():
     print(f"\n📋 Sample Training Examples:")
     print("-" * 60)
     
-    for i, sample in enumerate(all_instructions[:3], 1):
+    with open(output_file, 'rb') as f:
+        samples = [orjson.loads(line) for _, line in zip(range(3), f)]
+    
+    for i, sample in enumerate(samples, 1):
         print(f"\n--- Example {i} ---")
         print(f"Instruction: {sample['instruction']}")
         print(f"Input: {sample['input']}")
@@ -183,6 +256,38 @@ def process_nelson_files():
     
     return total_examples
 
+def write_shuffled_jsonl(lines, output_file, num_buckets=SHUFFLE_BUCKETS):
+    """
+    Write JSONL lines in random order without holding them all in memory
+    
+    Lines are scattered across random temporary bucket files, then each
+    bucket is shuffled in memory and appended to the output file.
+    """
+    
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        bucket_paths = [os.path.join(tmp_dir, f"bucket_{i}.jsonl") for i in range(num_buckets)]
+        
+        # Scatter lines across buckets; each bucket file buffers its own writes
+        bucket_files = [open(path, 'wb', buffering=WRITE_BUFFER_SIZE // num_buckets)
+                        for path in bucket_paths]
+        try:
+            for line in lines:
+                bucket_files[random.randrange(num_buckets)].write(line)
+        finally:
+            for bucket_file in bucket_files:
+                bucket_file.close()
+        
+        # Shuffle one bucket at a time into the output
+        rng = np.random.default_rng()
+        with open(output_file, 'wb') as f:
+            for path in bucket_paths:
+                with open(path, 'rb') as bucket_file:
+                    bucket_lines = bucket_file.readlines()
+                order = rng.permutation(len(bucket_lines))
+                f.write(b''.join([bucket_lines[i] for i in order]))
+
 def validate_instruction_format(file_path, check_count=50):
     """Validate the instruction format for training platform"""
     
@@ -191,13 +296,13 @@ def validate_instruction_format(file_path, check_count=50):
     valid_count = 0
     total_checked = 0
     
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(file_path, 'rb') as f:
         for line in f:
             if total_checked >= check_count:
                 break
                 
             try:
-                record = json.loads(line.strip())
+                record = orjson.loads(line)
                 
                 # Check required fields
                 required_fields = ['instruction', 'input', 'output']
@@ -208,7 +313,7 @@ def validate_instruction_format(file_path, check_count=50):
                 
                 total_checked += 1
                 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 total_checked += 1
     
     success_rate = (valid_count / total_checked) * 100 if total_checked > 0 else 0
@@ -4,8 +4,27 @@ Create Optimized Instruction Dataset - Short Format
 Generate concise instruction-tuning examples perfect for training platforms
 """
 
-import json
-import random
+import itertools
+import multiprocessing
+import numpy as np
+import orjson
+import sys
+
+# Flush serialized records to disk in ~1 MB batches
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Read the input JSONL in ~4 MB blocks
+READ_BLOCK_SIZE = 1 << 22
+
+# Input lines handed to each worker process at a time
+POOL_CHUNKSIZE = 1024
+
+# Key medical terms (matched anywhere in a lowercased sentence)
+MEDICAL_KEYWORDS = (
+    'diagnosis', 'treatment', 'therapy', 'symptoms', 'management',
+    'patients', 'clinical', 'disease', 'condition', 'infection',
+    'medication', 'dosage', 'complications', 'prognosis'
+)
 
 def extract_key_medical_info(text, max_length=400):
     """Extract the most relevant medical information from text"""
@@ -14,12 +33,6 @@ def extract_key_medical_info(text, max_length=400):
     sentences = text.replace('. ', '.|').split('|')
     
     # Find sentences with key medical terms
-    medical_keywords = [
-        'diagnosis', 'treatment', 'therapy', 'symptoms', 'management', 
-        'patients', 'clinical', 'disease', 'condition', 'infection',
-        'medication', 'dosage', 'complications', 'prognosis'
-    ]
-    
     relevant_sentences = []
     current_length = 0
     
@@ -29,7 +42,8 @@ def extract_key_medical_info(text, max_length=400):
             continue
             
         # Check if sentence contains medical keywords
-        if any(keyword in sentence.lower() for keyword in medical_keywords):
+        sentence_lower = sentence.lower()
+        if any(keyword in sentence_lower for keyword in MEDICAL_KEYWORDS):
             if current_length + len(sentence) <= max_length:
                 relevant_sentences.append(sentence)
                 current_length += len(sentence)
@@ -52,105 +66,150 @@ def extract_key_medical_info(text, max_length=400):
 def generate_focused_instructions(record):
     """Generate focused instruction-tuning examples"""
     
-    instructions = []
     text = record.get('text', '')
     specialty = record.get('medical_specialty', 'medicine')
     keywords = record.get('keywords', [])
     
     if len(text) < 100:
-        return instructions
+        return []
     
     # Extract key medical information
     focused_output = extract_key_medical_info(text)
     
+    # (instruction, input) pairs; every pair shares the same output
+    pairs = []
+    
     # Instruction 1: Medical Q&A
     if keywords and len(keywords) >= 2:
         primary_topic = keywords[0] if len(keywords[0]) > 3 else keywords[1]
-        
-        instruction1 = {
-            "instruction": "Answer a medical question based on clinical knowledge",
-            "input": f"What should I know about {primary_topic} in {specialty}?",
-            "output": focused_output
-        }
-        instructions.append(instruction1)
+        pairs.append((
+            "Answer a medical question based on clinical knowledge",
+            f"What should I know about {primary_topic} in {specialty}?"
+        ))
     
     # Instruction 2: Clinical guidance  
-    instruction2 = {
-        "instruction": "Provide clinical medical guidance",
-        "input": f"I need medical information about {specialty}. Can you provide guidance?",
-        "output": focused_output
-    }
-    instructions.append(instruction2)
+    pairs.append((
+        "Provide clinical medical guidance",
+        f"I need medical information about {specialty}. Can you provide guidance?"
+    ))
     
     # Instruction 3: Specialty-specific question
     if specialty != 'general':
         specialty_name = specialty.replace('_', ' ').title()
-        instruction3 = {
-            "instruction": f"Explain {specialty_name} medical concepts",
-            "input": f"Can you explain key {specialty_name} concepts?",
-            "output": focused_output
-        }
-        instructions.append(instruction3)
-    
-    return instructions
+        pairs.append((
+            f"Explain {specialty_name} medical concepts",
+            f"Can you explain key {specialty_name} concepts?"
+        ))
+    
+    return [
+        {"instruction": instruction, "input": input_text, "output": focused_output}
+        for instruction, input_text in pairs
+    ]
+
+def iter_lines(f, block_size=READ_BLOCK_SIZE):
+    """Yield raw lines (without newlines) from a binary file read in large blocks"""
+    
+    tail = b''
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        lines = (tail + block).split(b'\n')
+        tail = lines.pop()
+        yield from lines
+    
+    if tail:
+        yield tail
+
+def process_line(line):
+    """Parse one input line and generate its instructions (None if invalid JSON)"""
+    
+    # Records without a text field yield no instructions; skip parsing them
+    if b'"text"' not in line and line.startswith(b'{'):
+        return []
+    
+    try:
+        record = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+    
+    # Ship compact (instruction, input, output) rows back instead of dicts
+    return [(inst['instruction'], inst['input'], inst['output']) for inst in generate_focused_instructions(record)]
 
 def create_optimized_dataset(input_jsonl, output_jsonl):
-    """Create optimized instruction dataset with shorter outputs"""
+    """Create optimized instruction dataset with shorter outputs; returns the example count"""
     
     print("🦖 Creating OPTIMIZED Instruction Dataset")
     print("=" * 60)
     print("✨ Features: Shorter outputs, focused content, better for training")
     
-    instruction_records = []
+    # Per-record instruction lists, flattened once after reading
+    instruction_lists = []
+    instruction_count = 0
     processed_count = 0
     
-    with open(input_jsonl, 'r', encoding='utf-8') as f:
-        for line in f:
-            try:
-                record = json.loads(line.strip())
-                instructions = generate_focused_instructions(record)
-                instruction_records.extend(instructions)
-                processed_count += 1
-                
-                if processed_count % 1000 == 0:
-                    print(f"✅ Processed {processed_count:,} records → {len(instruction_records):,} instructions")
-                    
-            except json.JSONDecodeError:
+    # Parse and generate in worker processes; results come back in input order.
+    # The pool's task feeder thread reads ahead in large blocks meanwhile.
+    with open(input_jsonl, 'rb') as f, multiprocessing.Pool() as pool:
+        for instructions in pool.imap(process_line, iter_lines(f), chunksize=POOL_CHUNKSIZE):
+            if instructions is None:
                 continue
+            
+            # Instructions and inputs come from a handful of templates but arrive
+            # from the workers as separate copies; intern them so each is stored once
+            instruction_lists.append([
+                (sys.intern(instruction), sys.intern(input_text), output)
+                for instruction, input_text, output in instructions
+            ])
+            instruction_count += len(instructions)
+            processed_count += 1
+            
+            if processed_count % 1000 == 0:
+                print(f"✅ Processed {processed_count:,} records → {instruction_count:,} instructions")
+    
+    # Keep the records column-wise: one tuple per field instead of a dict per record
+    instruction_col, input_col, output_col = tuple(zip(*itertools.chain.from_iterable(instruction_lists))) or ((), (), ())
+    instruction_lists.clear()
     
-    # Shuffle for better training
-    random.shuffle(instruction_records)
+    # Shuffle for better training; records are written in a random index order
+    order = np.random.default_rng().permutation(len(output_col))
     
     # Write optimized JSONL
-    with open(output_jsonl, 'w', encoding='utf-8') as f:
-        for instruction in instruction_records:
-            f.write(json.dumps(instruction, ensure_ascii=False) + '\n')
+    with open(output_jsonl, 'wb') as f:
+        buf = bytearray()
+        for i in order:
+            buf += orjson.dumps({"instruction": instruction_col[i], "input": input_col[i], "output": output_col[i]})
+            buf += b'\n'
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
     
     print(f"\n🎉 Optimized dataset created!")
     print(f"📊 Statistics:")
     print(f"   Original records: {processed_count:,}")
-    print(f"   Instruction examples: {len(instruction_records):,}")
+    print(f"   Instruction examples: {len(output_col):,}")
     print(f"   Average output length: ~400 characters (optimized)")
     
     # Show samples
     print(f"\n📋 Sample Records (Optimized Format):")
     print("-" * 60)
     
-    for i, sample in enumerate(instruction_records[:3], 1):
-        print(f"\n--- Sample {i} ---")
-        print(f"Instruction: {sample['instruction']}")
-        print(f"Input: {sample['input']}")
-        print(f"Output Length: {len(sample['output'])} chars")
-        print(f"Output: {sample['output'][:200]}...")
+    for n, i in enumerate(order[:3], 1):
+        print(f"\n--- Sample {n} ---")
+        print(f"Instruction: {instruction_col[i]}")
+        print(f"Input: {input_col[i]}")
+        print(f"Output Length: {len(output_col[i])} chars")
+        print(f"Output: {output_col[i][:200]}...")
     
-    return instruction_records
+    return len(output_col)
 
 if __name__ == "__main__":
     input_file = "/project/workspace/godzilla_medical_dataset.jsonl"
     output_file = "/project/workspace/godzilla_instruction_optimized.jsonl"
     
-    records = create_optimized_dataset(input_file, output_file)
+    total_examples = create_optimized_dataset(input_file, output_file)
     
     print(f"\n🚀 Ready for training platform upload!")
     print(f"📁 Optimized file: godzilla_instruction_optimized.jsonl")
-    print(f"📊 Total examples: {len(records):,}")
\ No newline at end of file
+    print(f"📊 Total examples: {total_examples:,}")
\ No newline at end of file
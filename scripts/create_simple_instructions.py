@@ -4,17 +4,36 @@ Simple Medical Instruction Dataset Creator
 Creates clean, focused instruction-tuning examples from Godzilla dataset
 """
 
-import json
-import random
+import itertools
+import multiprocessing
+import numpy as np
+import orjson
+import re
+import sys
+
+# Flush serialized records to disk in ~1 MB batches
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Read the input JSONL in ~4 MB blocks
+READ_BLOCK_SIZE = 1 << 22
+
+# Input lines handed to each worker process at a time
+POOL_CHUNKSIZE = 1024
+
+# Common source artifacts, removed in a single pass. "copyright elsevier" is
+# left alone inside the full rights notice, where only the notice is removed.
+ARTIFACT_PATTERN = re.compile(
+    r'downloaded for mohamed ahmed drmmsgmailcom'
+    r'|elsevier inc all rights reserved'
+    r'|copyright elsevier(?! inc all rights reserved)'
+    r'|visit elsevier ebooks'
+)
 
 def clean_medical_text(text, max_length=500):
     """Clean and truncate medical text for instruction training"""
     
     # Remove common artifacts
-    text = text.replace('downloaded for mohamed ahmed drmmsgmailcom', '')
-    text = text.replace('elsevier inc all rights reserved', '')
-    text = text.replace('copyright elsevier', '')
-    text = text.replace('visit elsevier ebooks', '')
+    text = ARTIFACT_PATTERN.sub('', text)
     
     # Split into sentences and take meaningful ones
     sentences = text.split('. ')
@@ -26,9 +45,10 @@ def clean_medical_text(text, max_length=500):
         sentence = sentence.strip()
         if len(sentence) < 15:  # Skip very short fragments
             continue
-        if 'fig ' in sentence.lower() and len(sentence) < 50:  # Skip figure references
+        sentence_lower = sentence.lower()
+        if 'fig ' in sentence_lower and len(sentence) < 50:  # Skip figure references
             continue
-        if 'copyright' in sentence.lower():
+        if 'copyright' in sentence_lower:
             continue
             
         # Add sentence if it fits
@@ -76,7 +96,7 @@ def create_simple_instructions(record):
     
     # Example 2: Keyword-based question
     if keywords and len(keywords) > 0:
-        main_keyword = [k for k in keywords[:3] if len(k) > 3][0] if [k for k in keywords[:3] if len(k) > 3] else keywords[0]
+        main_keyword = next((k for k in keywords[:3] if len(k) > 3), keywords[0])
         
         inst2 = {
             "instruction": "Answer a specific medical question",
@@ -87,6 +107,36 @@ def create_simple_instructions(record):
     
     return instructions
 
+def iter_lines(f, block_size=READ_BLOCK_SIZE):
+    """Yield raw lines (without newlines) from a binary file read in large blocks"""
+    
+    tail = b''
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        lines = (tail + block).split(b'\n')
+        tail = lines.pop()
+        yield from lines
+    
+    if tail:
+        yield tail
+
+def process_line(line):
+    """Parse one input line and create its instructions (None if the line fails)"""
+    
+    # Records without a text field yield no instructions; skip parsing them
+    if b'"text"' not in line and line.startswith(b'{'):
+        return []
+    
+    try:
+        instructions = create_simple_instructions(orjson.loads(line))
+    except:
+        return None
+    
+    # Ship compact (instruction, input, output) rows back instead of dicts
+    return [(inst['instruction'], inst['input'], inst['output']) for inst in instructions]
+
 def main():
     print("🦖 GODZILLA MEDICAL INSTRUCTION DATASET - SIMPLE FORMAT")
     print("=" * 70)
@@ -94,51 +144,71 @@ def main():
     input_file = "/project/workspace/godzilla_medical_dataset.jsonl"
     output_file = "/project/workspace/godzilla_training_ready.jsonl"
     
-    instruction_records = []
+    # Per-record instruction lists, flattened once after reading
+    instruction_lists = []
+    instruction_count = 0
     processed = 0
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            try:
-                record = json.loads(line.strip())
-                instructions = create_simple_instructions(record)
-                instruction_records.extend(instructions)
-                processed += 1
-                
-                if processed % 1000 == 0:
-                    print(f"✅ Processed {processed:,} → Generated {len(instruction_records):,} instructions")
-                    
-            except:
+    # Parse and generate in worker processes; results come back in input order.
+    # The pool's task feeder thread reads ahead in large blocks meanwhile.
+    with open(input_file, 'rb') as f, multiprocessing.Pool() as pool:
+        for instructions in pool.imap(process_line, iter_lines(f), chunksize=POOL_CHUNKSIZE):
+            if instructions is None:
                 continue
-    
-    # Shuffle for training
-    random.shuffle(instruction_records)
-    
-    # Write final dataset
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for instruction in instruction_records:
-            f.write(json.dumps(instruction, ensure_ascii=False) + '\n')
+            
+            # Instructions and inputs come from a handful of templates but arrive
+            # from the workers as separate copies; intern them so each is stored once
+            instruction_lists.append([
+                (sys.intern(instruction), sys.intern(input_text), output)
+                for instruction, input_text, output in instructions
+            ])
+            instruction_count += len(instructions)
+            processed += 1
+            
+            if processed % 1000 == 0:
+                print(f"✅ Processed {processed:,} → Generated {instruction_count:,} instructions")
+    
+    # Keep the records column-wise: one tuple per field instead of a dict per record
+    instruction_col, input_col, output_col = tuple(zip(*itertools.chain.from_iterable(instruction_lists))) or ((), (), ())
+    instruction_lists.clear()
+    
+    # Shuffle for training; records are written in a random index order
+    order = np.random.default_rng().permutation(len(output_col))
+    
+    # Write final dataset, totalling output lengths for the stats as we go
+    total_output_length = 0
+    with open(output_file, 'wb') as f:
+        buf = bytearray()
+        for i in order:
+            output = output_col[i]
+            total_output_length += len(output)
+            buf += orjson.dumps({"instruction": instruction_col[i], "input": input_col[i], "output": output})
+            buf += b'\n'
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
     
     print(f"\n🎉 SUCCESS! Training-ready dataset created")
     print(f"📁 File: godzilla_training_ready.jsonl")
-    print(f"📊 Total examples: {len(instruction_records):,}")
+    print(f"📊 Total examples: {len(output_col):,}")
     
     # Calculate average lengths
-    if instruction_records:
-        avg_output_len = sum(len(r['output']) for r in instruction_records) / len(instruction_records)
+    if output_col:
+        avg_output_len = total_output_length / len(output_col)
         print(f"📏 Average output length: {avg_output_len:.0f} characters")
     
     # Show samples
     print(f"\n📋 Final Sample Records:")
     print("-" * 50)
     
-    for i, sample in enumerate(instruction_records[:2], 1):
-        print(f"\n--- Training Example {i} ---")
-        print(f"📝 Instruction: {sample['instruction']}")
-        print(f"❓ Input: {sample['input']}")
-        print(f"📖 Output ({len(sample['output'])} chars): {sample['output'][:300]}...")
+    for n, i in enumerate(order[:2], 1):
+        print(f"\n--- Training Example {n} ---")
+        print(f"📝 Instruction: {instruction_col[i]}")
+        print(f"❓ Input: {input_col[i]}")
+        print(f"📖 Output ({len(output_col[i])} chars): {output_col[i][:300]}...")
     
-    return len(instruction_records)
+    return len(output_col)
 
 if __name__ == "__main__":
     count = main()